@@ -1,24 +1,35 @@
-import json
 from pathlib import Path
 
 import pandas as pd
 
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QFileDialog
+from PySide6.QtCore import QThreadPool, Signal
+from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox, QWidget, QFileDialog, QPushButton, \
+    QTabBar, QTabWidget
 
+from modules.adapter_scan import adapter_scan_message, scan_kit_document
+from modules.combinatorial import CombinatorialIndexPairs
+from modules.export import write_json_file
+from modules.fingerprint import with_fingerprint
 from modules.illumina_indexes import IlluminaFormatIndexKitDefinition
+from modules.illumina_writer import write_illumina_kit
 from modules.index_table import IndexTableContainer
-from modules.kit_type import KitTypeFields
+from modules.kit_sources import kit_source_cache, load_kit_sources
+from modules.kit_type import KitTypeFields, load_kit_type_fields
 from modules.notification import Toast
+from modules.sample_sheet_import import ImportedSampleSheet
+from modules.session import SessionRecorder, saved_tab_ids, tab_session_dir
+from modules.validation import pool_collision_errors
 from ui.widget import Ui_Form
 import qdarktheme
 import qtawesome as qta
 import sys
-import yaml
-import csv
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 
 class IndexDefinitionConverter(QWidget, Ui_Form):
+    sources_loaded = Signal(object)
+
     def __init__(self) -> None:
         super().__init__()
         self.setupUi(self)
@@ -29,44 +40,102 @@ class IndexDefinitionConverter(QWidget, Ui_Form):
         self.csv_radioButton.setChecked(True)
         self.help_pushButton.setCheckable(True)
 
-        self.index_table_container = IndexTableContainer(self.kit_type_obj)
-        self.tablewidget = self.index_table_container.tablewidget
+        self.kit_cache = kit_source_cache()
+        self.kit_tabs = QTabWidget()
+        self.kit_tabs.setTabsClosable(True)
+        self.pool_check_pushButton = QPushButton("Check combined pool")
+        self.kit_tabs.setCornerWidget(self.pool_check_pushButton)
+        self.data_page_widget.layout().addWidget(self.kit_tabs)
+
+        self.sessions: Dict[IndexTableContainer, SessionRecorder] = {}
+        self._next_tab_id = 0
+        self._add_kit_tab("kit 1")
+        self.kit_tabs.tabBar().setTabButton(0, QTabBar.RightSide, None)
 
-        self.data_page_widget.layout().addWidget(self.index_table_container)
+        self.undo_shortcut = QShortcut(QKeySequence.Undo, self)
+        self.redo_shortcut = QShortcut(QKeySequence.Redo, self)
 
         self._connect_signals()
+        self._restore_session()
 
     def _connect_signals(self):
         self.help_pushButton.clicked.connect(self._toggle_help)
         self.load_pushButton.clicked.connect(self._load_data)
+        self.sources_loaded.connect(self._show_sources)
 
-        index_header = self.index_table_container.tablewidget.horizontalHeader()
-        self.restore_pushButton.clicked.connect(index_header.restore_orig_header)
-        self.index_table_container.resources_settings.widgets['kit_type'].currentTextChanged.connect(
-            index_header.restore_orig_header)
-
+        self.restore_pushButton.clicked.connect(
+            lambda: self.index_table_container.tablewidget.horizontalHeader().restore_orig_header())
         self.export_pushButton.clicked.connect(self._export)
-        self.unhide_pushButton.clicked.connect(self.index_table_container.tablewidget.show_all_columns)
-        self.index_table_container.notify_signal.connect(self.show_notification)
+        self.unhide_pushButton.clicked.connect(lambda: self.index_table_container.tablewidget.show_all_columns())
         self.csv_radioButton.toggled.connect(self._illumina_preset)
-
-    @staticmethod
-    def _detect_delimiter(file_path: Path) -> str:
-        with open(file_path, 'r') as csvfile:
-            content = csvfile.read()
-            dialect = csv.Sniffer().sniff(content)
-
-            return dialect.delimiter
+        self.kit_tabs.tabCloseRequested.connect(self._close_kit_tab)
+        self.pool_check_pushButton.clicked.connect(self._check_combined_pool)
+        self.undo_shortcut.activated.connect(lambda: self.session.undo())
+        self.redo_shortcut.activated.connect(lambda: self.session.redo())
+
+    @property
+    def index_table_container(self) -> IndexTableContainer:
+        return self.kit_tabs.currentWidget()
+
+    @property
+    def tablewidget(self):
+        return self.index_table_container.tablewidget
+
+    @property
+    def session(self) -> SessionRecorder:
+        return self.sessions[self.index_table_container]
+
+    def kit_containers(self) -> List[IndexTableContainer]:
+        return [self.kit_tabs.widget(index) for index in range(self.kit_tabs.count())]
+
+    def _add_kit_tab(self, title: str, tab_id: int | None = None) -> IndexTableContainer:
+        container = IndexTableContainer(self.kit_type_obj)
+        index_header = container.tablewidget.horizontalHeader()
+        container.resources_settings.widgets['kit_type'].currentTextChanged.connect(index_header.restore_orig_header)
+        container.notify_signal.connect(self.show_notification)
+        container.illumina_preset(self.ilmn_radioButton.isChecked())
+
+        tab_id = self._next_tab_id if tab_id is None else tab_id
+        self._next_tab_id = max(self._next_tab_id, tab_id + 1)
+        session = self.sessions[container] = SessionRecorder(container, tab_session_dir(tab_id))
+        session.notify_signal.connect(self.show_notification)
+        self.kit_tabs.addTab(container, title)
+        return container
+
+    def _close_kit_tab(self, index: int):
+        if index > 0:
+            container = self.kit_tabs.widget(index)
+            self.sessions.pop(container).remove()
+            self.kit_tabs.removeTab(index)
+            container.deleteLater()
+
+    def _restore_session(self):
+        for tab_id in saved_tab_ids():
+            self._add_kit_tab(f"kit {self.kit_tabs.count() + 1}", tab_id)
+        containers = self.kit_containers()
+        saved = [container for container in containers if self.sessions[container].has_saved_session()]
+        restore = bool(saved) and QMessageBox.question(self, "Restore session",
+                                                       "Restore the previous editing session?") == QMessageBox.Yes
+
+        for index, container in reversed(list(enumerate(containers))):
+            if restore and container in saved:
+                self.sessions[container].restore()
+                if file_path := container.user_settings.widgets['file_path'].text():
+                    self.kit_tabs.setTabText(index, Path(file_path).stem)
+            elif index > 0:
+                self._close_kit_tab(index)
+            elif saved:
+                self.sessions[container].discard()
+        if restore:
+            self.show_notification(f"Restored previous session ({len(saved)} kit tabs)")
 
     def _illumina_preset(self):
-        self.index_table_container.illumina_preset(self.ilmn_radioButton.isChecked())
+        for container in self.kit_containers():
+            container.illumina_preset(self.ilmn_radioButton.isChecked())
 
     def _load_kit_type(self, file_path: Path) -> Dict[str, KitTypeFields]:
-        with open(file_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-
         try:
-            return {kit_type: KitTypeFields({kit_type: data}) for kit_type, data in yaml_data.items()}
+            return load_kit_type_fields(file_path)
         except Exception as e:
             self.show_notification(f"Error: {str(e)}", warn=True)
 
@@ -79,31 +148,94 @@ class IndexDefinitionConverter(QWidget, Ui_Form):
         )
 
     def _load_data(self):
-        file = self._open_file_dialog()
-        if file:
-            self.index_table_container.user_settings.set_filepath(file)
-            self._load_csv(file) if self.csv_radioButton.isChecked() else self._load_ikd(file)
-
-    def _open_file_dialog(self) -> Path | None:
+        if not (files := self._open_file_dialog()):
+            return
+        self.load_pushButton.setEnabled(False)
+        if len(files) > 1:
+            self.show_notification(f"Loading {len(files)} kit files")
+        QThreadPool.globalInstance().start(lambda: self.sources_loaded.emit(load_kit_sources(files, self.kit_cache)))
+
+    def _show_sources(self, sources: Dict[Path, Any]):
+        self.load_pushButton.setEnabled(True)
+        reuse_current = len(sources) == 1 or self.tablewidget.rowCount() == 0
+
+        for file_path, source in sources.items():
+            if isinstance(source, Exception):
+                self.show_notification(f"Error loading {file_path.name}: {str(source)}", warn=True)
+                continue
+            if reuse_current:
+                self.kit_tabs.setTabText(self.kit_tabs.currentIndex(), file_path.stem)
+                reuse_current = False
+            else:
+                self.kit_tabs.setCurrentWidget(self._add_kit_tab(file_path.stem))
+
+            self.index_table_container.user_settings.set_filepath(file_path)
+            if isinstance(source, IlluminaFormatIndexKitDefinition):
+                self._show_ikd(source)
+            elif isinstance(source, ImportedSampleSheet):
+                self._show_sample_sheet(source)
+            else:
+                self._set_index_table_data(source)
+
+    def _open_file_dialog(self) -> List[Path]:
         file_dialog = QFileDialog(self)
         file_dialog.setFileMode(QFileDialog.ExistingFiles)
         file_dialog.setNameFilter(
             "ILMN Index TSV files (*.tsv)" if self.ilmn_radioButton.isChecked() else "Index CSV files (*.csv)")
 
         if file_dialog.exec():
-            return Path(file_dialog.selectedFiles()[0])
-        return None
-
-    def _load_csv(self, file_path: Path):
-        delim = self._detect_delimiter(file_path)
-        df = pd.read_csv(file_path, sep=delim)
-        self._set_index_table_data(df)
+            return [Path(file) for file in file_dialog.selectedFiles()]
+        return []
 
-    def _load_ikd(self, file_path: Path):
-        illumina_ikd = IlluminaFormatIndexKitDefinition(file_path)
+    def _show_ikd(self, illumina_ikd: IlluminaFormatIndexKitDefinition):
         self._set_index_table_data(illumina_ikd.indices_df)
         self.index_table_container.illumina_set_parameters(illumina_ikd)
         self.index_table_container.override_cycles_autoset()
+        if illumina_ikd.fixed_position_issues:
+            self.show_notification('\n'.join(illumina_ikd.fixed_position_issues), warn=True)
+        if illumina_ikd.is_combinatorial:
+            self._notify_combinatorial(illumina_ikd.index_pairs)
+
+    def _show_sample_sheet(self, sheet: ImportedSampleSheet):
+        self._set_index_table_data(sheet.indices_df)
+        resources_settings = self.index_table_container.resources_settings
+        resource = sheet.resource()
+        resources_settings.set_layout_illumina(resource.pop('kit_type'))
+        for field, value in resource.items():
+            resources_settings.widgets[field].setText(value)
+        if not any(field.startswith('override_cycles_pattern_i') for field in resource):
+            self.index_table_container.override_cycles_autoset()
+
+        message = (f"Imported {len(sheet.pairs)} index pairs from {sheet.samples} samples "
+                   f"(sample sheet v{sheet.version}, {sheet.duplicates} repeated pairs skipped)")
+        if sheet.position_source == 'pair order':
+            message += "; the sheet has no unique Sample_Well values, so fixed positions are numbered in pair order"
+        if len(sheet.override_cycles) > 1:
+            self.show_notification(f"{message}; the sheet uses {len(sheet.override_cycles)} OverrideCycles values, "
+                                   f"kept the most common", warn=True)
+        else:
+            self.show_notification(message)
+
+    def _notify_combinatorial(self, index_pairs: CombinatorialIndexPairs):
+        n_i7, n_i5 = index_pairs.shape
+        message = f"Combinatorial kit: {n_i7} i7 x {n_i5} i5 = {len(index_pairs)} index pairs"
+        if collisions := index_pairs.collision_count():
+            self.show_notification(f"{message}, {collisions} pairs share sequences with another pair", warn=True)
+        else:
+            self.show_notification(message)
+
+    def _check_combined_pool(self):
+        tables = {index: container.tablewidget.to_dataframe() for index, container in enumerate(self.kit_containers())
+                  if container.tablewidget.rowCount()}
+        titles = [self.kit_tabs.tabText(index) for index in range(self.kit_tabs.count())]
+        names = {index: titles[index] if titles.count(titles[index]) == 1 else f"{titles[index]} (tab {index + 1})"
+                 for index in tables}
+        if len(tables) < 2:
+            self.show_notification("Load at least two kits to check a combined pool", warn=True)
+        elif errors := pool_collision_errors(tables, names):
+            self.show_notification('\n'.join(errors), warn=True)
+        else:
+            self.show_notification(f"No index collisions in the combined pool of {len(tables)} kits")
 
     def _set_index_table_data(self, df: pd.DataFrame):
         self.index_table_container.set_index_table_data(df)
@@ -115,23 +247,32 @@ class IndexDefinitionConverter(QWidget, Ui_Form):
             return
 
         file_path = self._get_save_file_path()
-        if file_path:
+        if file_path.endswith('.tsv'):
+            self._save_illumina_file(file_path, all_data)
+        elif file_path:
             self._save_json_file(file_path, all_data)
 
     def _get_save_file_path(self) -> str:
         loaded_file = self.index_table_container.user_settings.get_filepath()
         proposed_filename = loaded_file.with_suffix(".json").name
-        file_path, _ = QFileDialog().getSaveFileName(
+        file_path, selected_filter = QFileDialog().getSaveFileName(
             caption="Save Index JSON File",
             dir=proposed_filename,
-            filter="JSON Files (*.json)"
+            filter="JSON Files (*.json);;Illumina Index Kit TSV (*.tsv)"
         )
-        return file_path + '.json' if file_path and not file_path.endswith('.json') else file_path
+        suffix = '.tsv' if selected_filter.endswith('(*.tsv)') else '.json'
+        return file_path + suffix if file_path and not file_path.endswith(suffix) else file_path
+
+    def _save_illumina_file(self, file_path: str, data: Dict[str, Any]):
+        try:
+            write_illumina_kit(data, Path(file_path))
+            self.show_notification(f"Illumina index kit file saved to: {file_path}")
+        except Exception as e:
+            self.show_notification(f"Error saving Illumina index kit file: {str(e)}", warn=True)
 
     def _save_json_file(self, file_path: str, data: Dict[str, Any]):
         try:
-            with open(file_path, 'w') as json_file:
-                json.dump(data, json_file, indent=4)
+            write_json_file(file_path, data)
             self.show_notification(f"Index JSON file saved to: {file_path}")
         except Exception as e:
             self.show_notification(f"Error saving JSON file: {str(e)}", warn=True)
@@ -144,15 +285,24 @@ class IndexDefinitionConverter(QWidget, Ui_Form):
             user_settings = self.index_table_container.user_settings.data()
             kit_settings = self.index_table_container.index_kit_settings.data()
 
+            if self.index_table_container.resources_settings.mixed_lengths():
+                resource_settings['override_cycles_length_groups'] = \
+                    self.index_table_container.override_cycles_length_groups()
+
             kit_type = resource_settings['kit_type']
             kit_settings['kit_type'] = self.kit_type_obj[kit_type].data
 
-            return {
+            document = {
                 'user_info': user_settings,
                 'resource': resource_settings,
                 'index_kit': kit_settings,
                 'indexes': table_settings,
+                'index_quality': self.index_table_container.quality_report(),
             }
+            if findings := scan_kit_document(document):
+                self.show_notification(adapter_scan_message(findings), warn=True)
+            document['adapter_scan'] = findings
+            return with_fingerprint(document)
         except Exception as e:
             self.show_notification(f"Error: {str(e)}", warn=True)
             return None
@@ -167,6 +317,11 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(IndexDefinitionConverter())
         self.setMinimumSize(600, 600)
 
+    def closeEvent(self, event):
+        for session in self.centralWidget().sessions.values():
+            session.close()
+        super().closeEvent(event)
+
 
 def main():
     app = QApplication(sys.argv)
@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from modules.adapter_scan import scan_archive
+from modules.bulk_validate import find_kit_json_files, validate_archive
+from modules.http_api import IndexApiServer
+from modules.illumina_writer import convert_kit_jsons
+from modules.kit_type import load_kit_type_fields
+from modules.lane_planner import DEFAULT_MIN_DISTANCE, plan_lanes, read_sample_groups, write_planned_manifest
+from modules.run_info import check_runs, read_run_info
+from modules.sample_sheet import parse_read_cycles, run_read_cycles, write_bclconvert_sample_sheet
+from modules.sample_sheet_import import harvest_sample_sheets
+from modules.watch_folder import WatchFolderConverter
+
+KIT_TYPE_FIELDS_PATH = Path(__file__).parent / "config/kit_type_fields.yaml"
+
+
+def _watch(args: argparse.Namespace):
+    converter = WatchFolderConverter(args.watch_dir, args.output_dir, args.kit_type_fields,
+                                     pattern=args.pattern, settle_seconds=args.settle,
+                                     poll_interval=args.interval, max_workers=args.workers)
+    try:
+        converter.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+def _serve(args: argparse.Namespace):
+    server = IndexApiServer(load_kit_type_fields(args.kit_type_fields), args.kit_dir, args.host, args.port,
+                            args.cache_size)
+
+    async def serve():
+        port = await server.start()
+        print(f"Serving index API on http://{args.host}:{port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def _check_runs(args: argparse.Namespace) -> int:
+    with open(args.kit_json, 'r') as kit_file:
+        report = check_runs(json.load(kit_file), args.run_info)
+    print(json.dumps(report, indent=4))
+    return int(any(entry['errors'] for entry in report.values()))
+
+
+def _validate(args: argparse.Namespace) -> int:
+    report = validate_archive(args.paths, args.kit_type_fields, pattern=args.pattern, max_workers=args.workers)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return int(report['invalid'] > 0)
+
+
+def _adapter_scan(args: argparse.Namespace) -> int:
+    report = scan_archive(find_kit_json_files(args.paths, args.pattern), max_workers=args.workers)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return int(report['with_findings'] > 0)
+
+
+def _to_illumina(args: argparse.Namespace) -> int:
+    results = convert_kit_jsons(find_kit_json_files(args.paths, args.pattern), args.output_dir, args.workers)
+    print(json.dumps(results, indent=4))
+    return int(any(result['error'] for result in results))
+
+
+def _sample_sheet(args: argparse.Namespace) -> int:
+    read_cycles = run_read_cycles(read_run_info(args.run_info).reads) if args.run_info \
+        else parse_read_cycles(args.cycles)
+    with open(args.kit_json, 'r') as kit_file:
+        document = json.load(kit_file)
+    try:
+        report = write_bclconvert_sample_sheet(document, args.manifest, args.output, read_cycles, args.run_name,
+                                               args.i5_reverse_complement, args.min_distance)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=4))
+    return 0
+
+
+def _plan_lanes(args: argparse.Namespace) -> int:
+    capacities = [int(value) for value in args.capacities.split(',')] if args.capacities \
+        else [args.capacity] * args.lanes
+    try:
+        fieldnames, groups = read_sample_groups(args.manifest)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    plan = plan_lanes(groups, capacities, args.min_distance, args.mixed_lengths, args.max_dark_cycles)
+    if args.output:
+        write_planned_manifest(fieldnames, groups, plan['placed'], args.output)
+    print(json.dumps(plan, indent=4))
+    return 1 if plan['unplaced'] else 0
+
+
+def _harvest(args: argparse.Namespace) -> int:
+    sheets = find_kit_json_files(args.paths, args.pattern)
+    registry = harvest_sample_sheets(sheets, args.output_dir, args.kit_type_fields, max_workers=args.workers)
+    print(json.dumps({key: value for key, value in registry.items() if key != 'kits'} |
+                     {'kits': len(registry['kits'])}, indent=4))
+    return int(bool(registry['errors']))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="index_tool_cli", description="Headless seq_index_tool commands")
+    parser.add_argument("--kit-type-fields", type=Path, default=KIT_TYPE_FIELDS_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    watch_parser = subparsers.add_parser("watch", help="Convert Illumina index kit TSVs dropped in a folder")
+    watch_parser.add_argument("watch_dir", type=Path)
+    watch_parser.add_argument("output_dir", type=Path)
+    watch_parser.add_argument("--pattern", default="*.tsv")
+    watch_parser.add_argument("--settle", type=float, default=2.0, help="seconds a file must be unchanged")
+    watch_parser.add_argument("--interval", type=float, default=1.0, help="poll interval in seconds")
+    watch_parser.add_argument("--workers", type=int, default=2)
+    watch_parser.add_argument("--once", action="store_true", help="convert what is there and exit")
+    watch_parser.set_defaults(func=_watch)
+
+    serve_parser = subparsers.add_parser("serve", help="Local HTTP API for conversion, validation and lookup")
+    serve_parser.add_argument("--kit-dir", type=Path, help="folder of Illumina index kit TSVs used for lookup")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--cache-size", type=int, default=64, help="number of parsed kits kept warm")
+    serve_parser.set_defaults(func=_serve)
+
+    check_runs_parser = subparsers.add_parser("check-runs", help="Check an exported kit against RunInfo.xml files")
+    check_runs_parser.add_argument("kit_json", type=Path)
+    check_runs_parser.add_argument("run_info", type=Path, nargs='+', help="RunInfo.xml files or run folders")
+    check_runs_parser.set_defaults(func=_check_runs)
+
+    validate_parser = subparsers.add_parser("validate", help="Validate a tree of exported index JSONs")
+    validate_parser.add_argument("paths", type=Path, nargs='+', help="index JSON files or folders")
+    validate_parser.add_argument("--pattern", default="*.json")
+    validate_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    validate_parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    validate_parser.set_defaults(func=_validate)
+
+    adapter_scan_parser = subparsers.add_parser("adapter-scan", help="Check kit indexes against their adapters")
+    adapter_scan_parser.add_argument("paths", type=Path, nargs='+', help="index JSON files or folders")
+    adapter_scan_parser.add_argument("--pattern", default="*.json")
+    adapter_scan_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    adapter_scan_parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    adapter_scan_parser.set_defaults(func=_adapter_scan)
+
+    to_illumina_parser = subparsers.add_parser("to-illumina", help="Write exported index JSONs as Illumina kit TSVs")
+    to_illumina_parser.add_argument("paths", type=Path, nargs='+', help="index JSON files or folders")
+    to_illumina_parser.add_argument("output_dir", type=Path)
+    to_illumina_parser.add_argument("--pattern", default="*.json")
+    to_illumina_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    to_illumina_parser.set_defaults(func=_to_illumina)
+
+    sample_sheet_parser = subparsers.add_parser("sample-sheet", help="Write a BCL Convert v2 sample sheet for a kit")
+    sample_sheet_parser.add_argument("kit_json", type=Path)
+    sample_sheet_parser.add_argument("manifest", type=Path, help="CSV with Sample_ID, optional Lane, and Well or "
+                                                                 "I7_Index_ID/I5_Index_ID columns")
+    sample_sheet_parser.add_argument("output", type=Path)
+    cycles_group = sample_sheet_parser.add_mutually_exclusive_group(required=True)
+    cycles_group.add_argument("--run-info", type=Path, help="take read cycles from this RunInfo.xml")
+    cycles_group.add_argument("--cycles", help="read cycles as r1,i1,i2,r2 (e.g. 151,10,10,151)")
+    sample_sheet_parser.add_argument("--run-name", default="")
+    sample_sheet_parser.add_argument("--i5-reverse-complement", action="store_true",
+                                     help="write Index2 as the reverse complement of the kit i5 sequence")
+    sample_sheet_parser.add_argument("--min-distance", type=int, default=DEFAULT_MIN_DISTANCE,
+                                     help="minimum Hamming distance between samples sharing a lane")
+    sample_sheet_parser.set_defaults(func=_sample_sheet)
+
+    harvest_parser = subparsers.add_parser("harvest", help="Collect index kits from an archive of sample sheets")
+    harvest_parser.add_argument("paths", type=Path, nargs='+', help="sample sheet files or folders")
+    harvest_parser.add_argument("output_dir", type=Path)
+    harvest_parser.add_argument("--pattern", default="*.csv")
+    harvest_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    harvest_parser.set_defaults(func=_harvest)
+
+    plan_parser = subparsers.add_parser("plan-lanes", help="Assign sample groups from several kits to lanes")
+    plan_parser.add_argument("manifest", type=Path, help="CSV with Sample_ID, Kit (index JSON path), optional "
+                                                         "Group or Sample_Project, and Well or index name columns")
+    plan_parser.add_argument("--lanes", type=int, default=8)
+    capacity_group = plan_parser.add_mutually_exclusive_group()
+    capacity_group.add_argument("--capacity", type=int, default=None, help="samples per lane")
+    capacity_group.add_argument("--capacities", help="comma separated samples per lane, one value per lane")
+    plan_parser.add_argument("--min-distance", type=int, default=DEFAULT_MIN_DISTANCE,
+                             help="minimum Hamming distance between samples sharing a lane")
+    plan_parser.add_argument("--mixed-lengths", action="store_true",
+                             help="allow different index lengths in one lane")
+    plan_parser.add_argument("--max-dark-cycles", type=int, default=None,
+                             help="index cycles per lane allowed to miss a two-colour channel (no limit by default)")
+    plan_parser.add_argument("--output", type=Path, help="write the manifest with a Lane column here")
+    plan_parser.set_defaults(func=_plan_lanes)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from modules.sequences import INVALID_CODE, PackedSequences, encode_bases, reverse_complement
+from modules.validation import INDEX_LABELS, INDEX_SEQUENCE_REGEX, field_type_errors, is_record_list, row_summary
+
+ADAPTER_FIELDS = ['adapter_read1', 'adapter_read2']
+ADAPTER_KMER = 8
+TERMINUS_MISMATCHES = 1
+INDEX_NAME_FIELDS = {'index_i7': 'index_i7_name', 'index_i5': 'index_i5_name'}
+
+
+def _kmer_codes(matrix: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if matrix.shape[1] < k:
+        empty = np.zeros((matrix.shape[0], 0), dtype=np.uint32)
+        return empty, empty.astype(bool)
+    windows = sliding_window_view(matrix, k, axis=1)
+    valid = (windows != INVALID_CODE).all(axis=2)
+    powers = 4 ** np.arange(k - 1, -1, -1, dtype=np.uint32)
+    return (windows.astype(np.uint32) * powers).sum(axis=2, dtype=np.uint32), valid
+
+
+class AdapterKmerIndex:
+    def __init__(self, adapters: Dict[str, str], k: int = ADAPTER_KMER):
+        self.k = k
+        self.sequences: Dict[str, str] = {}
+        for field, value in adapters.items():
+            for n, adapter in enumerate(part for part in (value or '').upper().split('+') if part):
+                name = field if n == 0 else f"{field} #{n + 1}"
+                self.sequences[name] = adapter
+                self.sequences[f"{name} reverse complement"] = reverse_complement(adapter)
+
+        self.kmer_owner: Dict[int, str] = {}
+        for name, adapter in self.sequences.items():
+            codes, valid = _kmer_codes(encode_bases(adapter)[None, :], k)
+            for code in codes[valid]:
+                self.kmer_owner.setdefault(int(code), name)
+        self.kmers = np.fromiter(self.kmer_owner, dtype=np.uint32, count=len(self.kmer_owner))
+        self._termini: Dict[int, Tuple[np.ndarray, List[str]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.sequences)
+
+    def termini(self, length: int) -> Tuple[np.ndarray, List[str]]:
+        if length not in self._termini:
+            rows, names = [], []
+            for name, adapter in self.sequences.items():
+                if len(adapter) >= length:
+                    rows += [encode_bases(adapter[:length]), encode_bases(adapter[-length:])]
+                    names += [f"5' end of {name}", f"3' end of {name}"]
+            self._termini[length] = (np.vstack(rows) if rows else np.zeros((0, length), dtype=np.uint8), names)
+        return self._termini[length]
+
+    def scan(self, sequences: Sequence[str | None]) -> List[Dict[str, Any]]:
+        sequences = [seq if isinstance(seq, str) and INDEX_SEQUENCE_REGEX.match(seq) else '' for seq in sequences]
+        packed = PackedSequences(sequences)
+        matrix, lengths = packed.code_matrix(), packed.lengths
+        findings: Dict[int, Dict[str, Any]] = {}
+
+        for length in np.unique(lengths[lengths > 0]):
+            rows = np.flatnonzero(lengths == length)
+            termini, names = self.termini(int(length))
+            if not names:
+                continue
+            mismatches = (matrix[rows, None, :length] != termini[None, :, :]).sum(axis=2)
+            best = mismatches.argmin(axis=1)
+            best_mismatches = mismatches[np.arange(rows.size), best]
+            close = best_mismatches <= TERMINUS_MISMATCHES
+            for row, terminus, count in zip(rows[close], best[close], best_mismatches[close]):
+                findings[int(row)] = {'kind': 'terminus', 'adapter': names[terminus], 'mismatches': int(count)}
+
+        codes, valid = _kmer_codes(matrix, self.k)
+        hits = np.isin(codes, self.kmers) & valid
+        for row in np.flatnonzero(hits.any(axis=1)):
+            if int(row) not in findings:
+                row_hits = codes[row][hits[row]]
+                findings[int(row)] = {'kind': 'kmer', 'adapter': self.kmer_owner[int(row_hits[0])],
+                                      'kmers': int(row_hits.size)}
+        return [{'row': row, 'sequence': sequences[row], **finding} for row, finding in sorted(findings.items())]
+
+
+@lru_cache(maxsize=64)
+def adapter_index(adapter_read1: str, adapter_read2: str, k: int = ADAPTER_KMER) -> AdapterKmerIndex:
+    return AdapterKmerIndex({'adapter_read1': adapter_read1, 'adapter_read2': adapter_read2}, k)
+
+
+def scan_index_columns(columns: Dict[str, Sequence[str | None]], names: Dict[str, Sequence[str | None]],
+                       resource: Dict[str, Any]) -> List[Dict[str, Any]]:
+    index = adapter_index(*(resource.get(field) or '' for field in ADAPTER_FIELDS))
+    if not index:
+        return []
+    labels = [label for label in INDEX_LABELS if label in columns]
+    sequences = [value for label in labels for value in columns[label]]
+    offsets = np.cumsum([0] + [len(columns[label]) for label in labels])
+
+    findings = []
+    for finding in index.scan(sequences):
+        n = int(np.searchsorted(offsets, finding['row'], side='right')) - 1
+        label, row = labels[n], finding['row'] - int(offsets[n])
+        label_names = names.get(label) or []
+        findings.append({**finding, 'label': label, 'row': row,
+                         'name': label_names[row] if row < len(label_names) else None})
+    return findings
+
+
+def scan_document_errors(document: Any) -> List[str]:
+    if not isinstance(document, dict):
+        return ["Kit file must hold a JSON object"]
+    if missing_sections := [section for section in ['resource', 'indexes']
+                            if not isinstance(document.get(section, {}), dict)]:
+        return [f"Document sections must be objects: {', '.join(missing_sections)}"]
+    resource = document.get('resource') or {}
+    return (field_type_errors('resource', {field: resource[field] for field in ADAPTER_FIELDS if resource.get(field)})
+            + [f"Index set {set_name} must be a list of objects"
+               for set_name, records in document.get('indexes', {}).items() if not is_record_list(records)])
+
+
+def scan_kit_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    seen: Dict[Tuple[str, str], str | None] = {}
+    for records in document.get('indexes', {}).values():
+        for record in records:
+            for label, name_field in INDEX_NAME_FIELDS.items():
+                if record.get(label):
+                    seen.setdefault((label, str(record[label]).upper()), record.get(name_field))
+    columns: Dict[str, List[str]] = {}
+    names: Dict[str, List[str | None]] = {}
+    for (label, sequence), name in seen.items():
+        columns.setdefault(label, []).append(sequence)
+        names.setdefault(label, []).append(name)
+    return [{key: value for key, value in finding.items() if key != 'row'}
+            for finding in scan_index_columns(columns, names, document.get('resource') or {})]
+
+
+def adapter_finding_message(finding: Dict[str, Any]) -> str:
+    index = finding.get('name') or finding['sequence']
+    if finding['kind'] == 'terminus':
+        return f"{finding['label']} {index} matches the {finding['adapter']} with {finding['mismatches']} mismatches"
+    return f"{finding['label']} {index} shares {finding['kmers']} {ADAPTER_KMER}-mers with {finding['adapter']}"
+
+
+def adapter_scan_message(findings: List[Dict[str, Any]]) -> str:
+    return (f"{len(findings)} indexes resemble adapter sequence: "
+            f"{row_summary([adapter_finding_message(finding) for finding in findings], limit=5)}")
+
+
+def scan_kit_file(file_path: Path) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        with open(file_path, 'r') as kit_file:
+            document = json.load(kit_file)
+        if errors := scan_document_errors(document):
+            raise ValueError(errors[0])
+        findings, error = scan_kit_document(document), None
+    except (OSError, UnicodeDecodeError, ValueError, TypeError, KeyError, AttributeError) as e:
+        findings, error = [], f"{type(e).__name__}: {e}"
+    return {'file': str(file_path), 'error': error, 'findings': findings,
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+def _scan_chunk(file_paths: List[Path]) -> List[Dict[str, Any]]:
+    return [scan_kit_file(file_path) for file_path in file_paths]
+
+
+def scan_archive(file_paths: Iterable[Path], max_workers: int | None = None,
+                 chunk_size: int = 16) -> Dict[str, Any]:
+    start = time.perf_counter()
+    file_paths = list(file_paths)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(file_paths)))
+
+    results = []
+    if file_paths:
+        chunks = [file_paths[n:n + chunk_size] for n in range(0, len(file_paths), chunk_size)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for chunk_results in executor.map(_scan_chunk, chunks):
+                results.extend(chunk_results)
+
+    return {
+        'files': len(results),
+        'with_findings': sum(bool(result['findings']) for result in results),
+        'errors': sum(bool(result['error']) for result in results),
+        'workers': max_workers,
+        'seconds': round(time.perf_counter() - start, 4),
+        'results': results,
+    }
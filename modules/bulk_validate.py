@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from modules.export import TIMESTAMP_FORMAT
+from modules.fingerprint import FINGERPRINT_KEY, kit_fingerprint
+from modules.kit_type import KitTypeFields, load_kit_type_fields
+from modules.sample_sheet_import import REGISTRY_NAME
+from modules.validation import validate_kit_document
+from modules.watch_folder import MANIFEST_NAME
+
+REPORT_NAMES = {MANIFEST_NAME, REGISTRY_NAME}
+
+_worker_kit_type_fields: Dict[str, KitTypeFields] = {}
+
+
+def _init_worker(kit_type_fields_path: Path):
+    global _worker_kit_type_fields
+    _worker_kit_type_fields = load_kit_type_fields(kit_type_fields_path)
+
+
+def validate_kit_file(file_path: Path, kit_type_fields: Dict[str, KitTypeFields]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    kit_type = fingerprint = None
+    try:
+        with open(file_path, 'r') as kit_file:
+            document = json.load(kit_file)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        errors = [f"Unreadable JSON: {e}"]
+    else:
+        if isinstance(document, dict):
+            try:
+                errors = validate_kit_document(document, kit_type_fields)
+            except Exception as e:
+                errors = [f"Could not validate document: {type(e).__name__}: {e}"]
+            if isinstance(document.get('resource'), dict) and isinstance(document['resource'].get('kit_type'), str):
+                kit_type = document['resource']['kit_type']
+            if not errors and isinstance(document.get(FINGERPRINT_KEY), str):
+                fingerprint = document[FINGERPRINT_KEY]
+            else:
+                try:
+                    fingerprint = kit_fingerprint(document)
+                except (AttributeError, TypeError):
+                    pass
+        else:
+            errors = ["Document is not a JSON object"]
+    return {'file': str(file_path), 'kit_type': kit_type, 'fingerprint': fingerprint, 'valid': not errors,
+            'errors': errors, 'seconds': round(time.perf_counter() - start, 4)}
+
+
+def _validate_chunk(file_paths: List[Path]) -> List[Dict[str, Any]]:
+    return [validate_kit_file(file_path, _worker_kit_type_fields) for file_path in file_paths]
+
+
+def find_kit_json_files(paths: Iterable[Path], pattern: str = '*.json') -> Iterator[Path]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(file_path for file_path in path.rglob(pattern) if file_path.name not in REPORT_NAMES)
+        else:
+            yield path
+
+
+def _chunks(items: List[Path], chunk_size: int) -> Iterator[List[Path]]:
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def validate_archive(paths: Iterable[Path], kit_type_fields_path: Path, pattern: str = '*.json',
+                     max_workers: int | None = None, chunk_size: int = 16) -> Dict[str, Any]:
+    start = time.perf_counter()
+    file_paths = list(find_kit_json_files(paths, pattern))
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(file_paths)))
+
+    results = []
+    if file_paths:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(kit_type_fields_path,)) as executor:
+            for chunk_results in executor.map(_validate_chunk, _chunks(file_paths, chunk_size)):
+                results.extend(chunk_results)
+
+    invalid = [result for result in results if not result['valid']]
+    by_fingerprint: Dict[str, List[str]] = {}
+    for result in results:
+        if result['fingerprint']:
+            by_fingerprint.setdefault(result['fingerprint'], []).append(result['file'])
+    return {
+        'checked': datetime.now().strftime(TIMESTAMP_FORMAT),
+        'kit_type_fields': str(kit_type_fields_path),
+        'files': len(results),
+        'valid': len(results) - len(invalid),
+        'invalid': len(invalid),
+        'workers': max_workers,
+        'seconds': round(time.perf_counter() - start, 4),
+        'file_seconds': round(sum(result['seconds'] for result in results), 4),
+        'duplicates': {fingerprint: files for fingerprint, files in by_fingerprint.items() if len(files) > 1},
+        'results': results,
+    }
@@ -0,0 +1,196 @@
+import math
+from typing import Dict, Iterable, List, Set, Tuple
+
+from modules.validation import INDEX_SEQUENCE_REGEX, invalid_rows_message, row_summary
+
+
+def cell_value(value: str | float | None) -> str | None:
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value in ('', 'nan'):
+        return None
+    return value
+
+
+class IndexColumnState:
+    def __init__(self, label: str, values: Iterable[str | None] = ()):
+        self.label = label
+        self.values: List[str | None] = []
+        self.invalid_rows: Set[int] = set()
+        self.rows_by_length: Dict[int, Set[int]] = {}
+        for row, value in enumerate(values):
+            self.values.append(None)
+            self._add(row, value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def length_histogram(self) -> Dict[int, int]:
+        return {length: len(rows) for length, rows in sorted(self.rows_by_length.items())}
+
+    @property
+    def majority_length(self) -> int | None:
+        return max(self.rows_by_length, key=lambda length: (len(self.rows_by_length[length]), -length), default=None)
+
+    def sequences(self) -> List[str | None]:
+        return [None if row in self.invalid_rows else value for row, value in enumerate(self.values)]
+
+    def _add(self, row: int, value: str | None):
+        self.values[row] = value = cell_value(value)
+        if not value:
+            return
+        if not INDEX_SEQUENCE_REGEX.match(value):
+            self.invalid_rows.add(row)
+            return
+        self.rows_by_length.setdefault(len(value), set()).add(row)
+
+    def _remove(self, row: int):
+        value = self.values[row]
+        self.values[row] = None
+        if not value:
+            return
+        if row in self.invalid_rows:
+            self.invalid_rows.discard(row)
+            return
+
+        rows = self.rows_by_length[len(value)]
+        rows.discard(row)
+        if not rows:
+            del self.rows_by_length[len(value)]
+
+    def update(self, row: int, value: str | None) -> Set[int]:
+        if row >= len(self.values):
+            self.values.extend([None] * (row + 1 - len(self.values)))
+        if cell_value(value) == self.values[row]:
+            return set()
+
+        majority = self.majority_length
+        self._remove(row)
+        self._add(row, value)
+        changed = {row}
+        if self.majority_length != majority:
+            for length in (majority, self.majority_length):
+                changed |= self.rows_by_length.get(length, set())
+        return changed
+
+    def cell_error(self, row: int, mixed_lengths: bool = False) -> str | None:
+        value = self.values[row] if row < len(self.values) else None
+        if not value:
+            return None
+        if row in self.invalid_rows:
+            return f"{self.label} contains characters other than ACGT"
+        if not mixed_lengths and len(value) != self.majority_length:
+            return f"{self.label} is {len(value)} bp, most indexes are {self.majority_length} bp"
+        return None
+
+    def errors(self, mixed_lengths: bool = False) -> List[str]:
+        errors = []
+        if self.invalid_rows:
+            errors.append(invalid_rows_message(self.label, sorted(row + 1 for row in self.invalid_rows)))
+        if not mixed_lengths and len(self.rows_by_length) > 1:
+            histogram = ', '.join(f"{length} bp: {count}" for length, count in self.length_histogram.items())
+            errors.append(f"{self.label} column contains indexes of different lengths ({histogram})")
+        return errors
+
+
+def _shared_lengths(a: Tuple[int, ...], b: Tuple[int, ...]) -> Tuple[int, ...]:
+    return tuple(min(x, y) for x, y in zip(a, b))
+
+
+class IndexCollisionState:
+    def __init__(self, labels: Tuple[str, ...], keys: Iterable[Tuple[str, ...] | None] = ()):
+        self.labels = labels
+        self.keys: Dict[int, Tuple[str, ...]] = {}
+        self.groups: Dict[Tuple[int, ...], Set[int]] = {}
+        self.buckets: Dict[Tuple[Tuple[int, ...], Tuple[int, ...]], Dict[Tuple[str, ...], Set[int]]] = {}
+        for row, key in enumerate(keys):
+            if key:
+                self._insert(row, key)
+        self.colliding_rows: Set[int] = {row for row in self.keys if self._collides(row)}
+
+    @staticmethod
+    def _lengths(key: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(len(seq) for seq in key)
+
+    def _bucket(self, group: Tuple[int, ...], shared: Tuple[int, ...], key: Tuple[str, ...]) -> Set[int]:
+        if (group, shared) not in self.buckets:
+            index = self.buckets[(group, shared)] = {}
+            for row in self.groups[group]:
+                index.setdefault(tuple(seq[:n] for seq, n in zip(self.keys[row], shared)), set()).add(row)
+        return self.buckets[(group, shared)].get(tuple(seq[:n] for seq, n in zip(key, shared)), set())
+
+    def _insert(self, row: int, key: Tuple[str, ...]):
+        lengths = self._lengths(key)
+        self.keys[row] = key
+        self.groups.setdefault(lengths, set()).add(row)
+        self.buckets.setdefault((lengths, lengths), {})
+        for (group, shared), index in self.buckets.items():
+            if group == lengths:
+                index.setdefault(tuple(seq[:n] for seq, n in zip(key, shared)), set()).add(row)
+
+    def _delete(self, row: int):
+        key = self.keys.pop(row)
+        lengths = self._lengths(key)
+        for (group, shared), index in self.buckets.items():
+            if group == lengths:
+                shared_key = tuple(seq[:n] for seq, n in zip(key, shared))
+                index[shared_key].discard(row)
+                if not index[shared_key]:
+                    del index[shared_key]
+        self.groups[lengths].discard(row)
+        if not self.groups[lengths]:
+            del self.groups[lengths]
+            needed = {(group, _shared_lengths(group, other)) for group in self.groups for other in self.groups}
+            self.buckets = {pair: index for pair, index in self.buckets.items() if pair in needed}
+
+    def _collides(self, row: int) -> bool:
+        key = self.keys.get(row)
+        if not key:
+            return False
+        lengths = self._lengths(key)
+        for group in list(self.groups):
+            rows = self._bucket(group, _shared_lengths(group, lengths), key)
+            if len(rows) > (row in rows):
+                return True
+        return False
+
+    def _partner_candidates(self, row: int) -> Set[int]:
+        key = self.keys[row]
+        lengths = self._lengths(key)
+        candidates = set()
+        for group in list(self.groups):
+            shared = _shared_lengths(group, lengths)
+            own = self._bucket(lengths, shared, key)
+            if len(own) - (row in own) <= 1:
+                candidates |= self._bucket(group, shared, key) - {row}
+        return candidates
+
+    def update(self, row: int, key: Tuple[str, ...] | None) -> Set[int]:
+        if self.keys.get(row) == (key or None):
+            return set()
+        candidates = {row}
+        if row in self.keys:
+            candidates |= self._partner_candidates(row)
+            self._delete(row)
+        if key:
+            self._insert(row, key)
+            candidates |= self._partner_candidates(row)
+
+        changed = set()
+        for candidate in candidates:
+            collides = self._collides(candidate)
+            if collides != (candidate in self.colliding_rows):
+                changed.add(candidate)
+                (self.colliding_rows.add if collides else self.colliding_rows.discard)(candidate)
+        return changed
+
+    def shared_keys(self) -> Dict[Tuple[str, ...], int]:
+        return {key: len(rows) for (group, shared), index in self.buckets.items() if group == shared
+                for key, rows in index.items() if len(rows) > 1}
+
+    def message(self) -> str:
+        shared = self.shared_keys()
+        prefix_rows = len(self.colliding_rows) - sum(shared.values())
+        parts = [f"{'+'.join(key)} in {count} rows" for key, count in sorted(shared.items(), key=lambda x: -x[1])]
+        if prefix_rows > 0:
+            parts.append(f"{prefix_rows} rows match the start of a longer index")
+        return f"{' + '.join(self.labels)} collide in {len(self.colliding_rows)} rows: {row_summary(parts)}"
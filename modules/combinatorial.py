@@ -0,0 +1,57 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.validation import invalid_index_rows, invalid_rows_message, index_lengths
+
+PAIR_COLUMNS = ['index_i7_name', 'index_i7', 'index_i5_name', 'index_i5']
+
+
+class CombinatorialIndexPairs:
+    def __init__(self, indices_i7: pd.DataFrame, indices_i5: pd.DataFrame):
+        self.indices_i7 = indices_i7[['index_i7_name', 'index_i7']].reset_index(drop=True)
+        self.indices_i5 = indices_i5[['index_i5_name', 'index_i5']].reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self.indices_i7) * len(self.indices_i5)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.indices_i7), len(self.indices_i5)
+
+    def pair(self, k: int) -> Tuple[str, str, str, str]:
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        row_i7, row_i5 = divmod(k, len(self.indices_i5))
+        return (*self.indices_i7.iloc[row_i7], *self.indices_i5.iloc[row_i5])
+
+    def __iter__(self) -> Iterator[Tuple[str, str, str, str]]:
+        i5_rows = list(self.indices_i5.itertuples(index=False, name=None))
+        for i7_row in self.indices_i7.itertuples(index=False, name=None):
+            for i5_row in i5_rows:
+                yield i7_row + i5_row
+
+    def iter_chunks(self, chunk_size: int = 4096) -> Iterator[pd.DataFrame]:
+        n_i5 = len(self.indices_i5)
+        for start in range(0, len(self), chunk_size):
+            rows_i7, rows_i5 = np.divmod(np.arange(start, min(start + chunk_size, len(self))), n_i5)
+            yield pd.concat([self.indices_i7.iloc[rows_i7].reset_index(drop=True),
+                             self.indices_i5.iloc[rows_i5].reset_index(drop=True)], axis=1)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return next(self.iter_chunks(max(len(self), 1)), pd.DataFrame(columns=PAIR_COLUMNS))
+
+    def validation_errors(self) -> List[str]:
+        errors = []
+        for label, df in [('index_i7', self.indices_i7), ('index_i5', self.indices_i5)]:
+            if invalid_rows := invalid_index_rows(label, df):
+                errors.append(invalid_rows_message(label, invalid_rows))
+            elif len(index_lengths(label, df)) > 1:
+                errors.append(f"{label} column contains indexes of different lengths")
+        return errors
+
+    def collision_count(self) -> int:
+        i7_sizes = self.indices_i7['index_i7'].str.upper().value_counts()
+        i5_sizes = self.indices_i5['index_i5'].str.upper().value_counts()
+        return len(self) - int((i7_sizes == 1).sum()) * int((i5_sizes == 1).sum())
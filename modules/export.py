@@ -0,0 +1,132 @@
+import getpass
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from modules.adapter_scan import scan_kit_document
+from modules.fingerprint import with_fingerprint
+from modules.illumina_indexes import IlluminaFormatIndexKitDefinition
+from modules.index_quality import kit_quality_report
+from modules.kit_type import KitTypeFields
+from modules.validation import (INDEX_LABELS, index_collision_errors, index_column_errors, index_kit_errors,
+                                index_lengths, length_group_override_cycles, override_cycles_errors)
+
+TIMESTAMP_FORMAT = "%y%m%d %H.%M.%S"
+
+
+def clean_index_df(df: pd.DataFrame) -> pd.DataFrame:
+    return df.dropna(axis=1, how='all').loc[:, (df != '').any()]
+
+
+def index_set_dict(df: pd.DataFrame, kit_type_obj: KitTypeFields) -> Dict[str, List[Dict[str, Any]]]:
+    index_set_dict = {}
+
+    for set_name in kit_type_obj.index_set_names:
+        fields = kit_type_obj.index_set_fields(set_name)
+        _df = df[fields].copy().replace(['nan', ''], np.nan).dropna(how='all')
+
+        if _df.isnull().any().any():
+            raise ValueError(f"Error: NaN values in the index table for {set_name}")
+        else:
+            index_set_dict[set_name] = _df.to_dict(orient='records')
+
+    return index_set_dict
+
+
+def index_override_cycles(df: pd.DataFrame, labels: Iterable[str] = tuple(INDEX_LABELS),
+                          mixed_lengths: bool = False) -> Dict[str, str]:
+    labels = [label for label in labels if label in df.columns]
+    if errors := index_column_errors(df, labels, mixed_lengths):
+        raise ValueError(errors[0])
+    return {INDEX_LABELS[label]: f"I{max(index_lengths(label, df))}" for label in labels}
+
+
+def override_cycles_length_groups(df: pd.DataFrame) -> Dict[str, Dict[str, str]]:
+    return {INDEX_LABELS[label]: length_group_override_cycles(label, df)
+            for label in INDEX_LABELS if label in df.columns}
+
+
+def user_info(file_path: Path, user: str = '') -> Dict[str, str]:
+    ad_user = getpass.getuser()
+    return {
+        'user': user or ad_user,
+        'ad_user': ad_user,
+        'file_path': str(file_path),
+        'timestamp': datetime.now().strftime(TIMESTAMP_FORMAT),
+    }
+
+
+def table_kit_data(df: pd.DataFrame, kit_type_fields: Dict[str, KitTypeFields], kit_type: str,
+                   index_kit: Dict[str, str], resource: Dict[str, str],
+                   user_settings: Dict[str, str], mixed_lengths: bool = False) -> Dict[str, Any]:
+    if kit_type not in kit_type_fields:
+        raise ValueError(f"Unsupported kit type: {kit_type}")
+    kit_type_obj = kit_type_fields[kit_type]
+
+    df = clean_index_df(df).astype(str)
+    if df.empty:
+        raise ValueError('Table is empty')
+    if unset_labels := set(kit_type_obj.fields) - set(df.columns):
+        raise ValueError(f"Required header labels are not set in the table: {', '.join(unset_labels)}")
+
+    autoset_labels = [label for label, field in INDEX_LABELS.items() if not resource.get(field)]
+    override_cycles = {**index_override_cycles(df, autoset_labels, mixed_lengths),
+                       **{field: value for field, value in resource.items() if value}}
+    resource_settings = {
+        'adapter_read1': resource.get('adapter_read1', ''),
+        'adapter_read2': resource.get('adapter_read2', ''),
+        'kit_type': kit_type,
+        'override_cycles_pattern_r1': override_cycles.get('override_cycles_pattern_r1') or 'Yx',
+        'override_cycles_pattern_i1': override_cycles.get('override_cycles_pattern_i1', ''),
+        'override_cycles_pattern_i2': override_cycles.get('override_cycles_pattern_i2', ''),
+        'override_cycles_pattern_r2': override_cycles.get('override_cycles_pattern_r2') or 'Yx',
+    }
+    if mixed_lengths:
+        resource_settings['override_cycles_length_groups'] = override_cycles_length_groups(df)
+    if errors := override_cycles_errors(resource_settings) + index_collision_errors(df, kit_type_obj):
+        raise ValueError(errors[0])
+
+    kit_settings = {key: index_kit.get(key, '') for key in ['name', 'display_name', 'version', 'description']}
+    if errors := index_kit_errors(kit_settings):
+        raise ValueError(errors[0])
+    kit_settings['kit_type'] = kit_type_obj.data
+
+    document = {
+        'user_info': user_settings,
+        'resource': resource_settings,
+        'index_kit': kit_settings,
+        'indexes': index_set_dict(df, kit_type_obj),
+        'index_quality': kit_quality_report(df),
+    }
+    document['adapter_scan'] = scan_kit_document(document)
+    return with_fingerprint(document)
+
+
+def illumina_kit_data(ikd: IlluminaFormatIndexKitDefinition, kit_type_fields: Dict[str, KitTypeFields],
+                      file_path: Path, user: str = '') -> Dict[str, Any]:
+    if ikd.fixed_position_issues:
+        raise ValueError('; '.join(ikd.fixed_position_issues))
+
+    index_kit = {key: ikd.index_kit.get(key, '').replace(' ', '').replace('-', '')
+                 for key in ['name', 'display_name', 'version', 'description']}
+    resource = {'adapter_read1': ikd.resources.get('adapter', ''),
+                'adapter_read2': ikd.resources.get('adapter_read2', '')}
+    return table_kit_data(ikd.indices_df, kit_type_fields, ikd.kit_type, index_kit, resource,
+                          user_info(file_path, user))
+
+
+def convert_illumina_kit(ilmn_index_file_path: Path, output_path: Path,
+                         kit_type_fields: Dict[str, KitTypeFields], user: str = '') -> Dict[str, Any]:
+    ikd = IlluminaFormatIndexKitDefinition(ilmn_index_file_path, keep_raw=False)
+    data = illumina_kit_data(ikd, kit_type_fields, ilmn_index_file_path, user)
+    write_json_file(output_path, data)
+    return data
+
+
+def write_json_file(file_path: Path, data: Dict[str, Any]):
+    with open(file_path, 'w') as json_file:
+        json.dump(data, json_file, indent=4)
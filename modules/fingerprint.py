@@ -0,0 +1,29 @@
+import hashlib
+import json
+from typing import Any, Dict
+
+FINGERPRINT_KEY = 'fingerprint'
+FINGERPRINT_SECTIONS = ['resource', 'index_kit', 'indexes']
+SEQUENCE_FIELDS = frozenset(['index_i7', 'index_i5'])
+
+
+def _canonical_indexes(indexes: Dict[str, Any]) -> Dict[str, Any]:
+    return {set_name: [{field: value.upper() if field in SEQUENCE_FIELDS and isinstance(value, str) else value
+                        for field, value in record.items()} for record in records]
+            for set_name, records in indexes.items()}
+
+
+def canonical_kit_json(document: Dict[str, Any]) -> bytes:
+    sections = {section: document[section] for section in FINGERPRINT_SECTIONS if section in document}
+    if isinstance(sections.get('indexes'), dict):
+        sections['indexes'] = _canonical_indexes(sections['indexes'])
+    return json.dumps(sections, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def kit_fingerprint(document: Dict[str, Any]) -> str:
+    return f"sha256:{hashlib.sha256(canonical_kit_json(document)).hexdigest()}"
+
+
+def with_fingerprint(document: Dict[str, Any]) -> Dict[str, Any]:
+    content = {key: value for key, value in document.items() if key != FINGERPRINT_KEY}
+    return {FINGERPRINT_KEY: kit_fingerprint(content), **content}
@@ -0,0 +1,79 @@
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+FIXED_POSITION_TYPE = 'FixedIndexPosition'
+
+
+class FixedPositionResolution:
+    def __init__(self, df: pd.DataFrame, missing: List[Tuple[str, str]], duplicate_positions: List[str],
+                 duplicate_names: Dict[str, List[str]]):
+        self.df = df
+        self.missing = missing
+        self.duplicate_positions = duplicate_positions
+        self.duplicate_names = duplicate_names
+
+    @property
+    def issues(self) -> List[str]:
+        issues = [f"Fixed position {pos} refers to unknown index {value}" for pos, value in self.missing]
+        if self.duplicate_positions:
+            issues.append(f"Fixed positions defined more than once: {', '.join(self.duplicate_positions)}")
+        for index_type, names in self.duplicate_names.items():
+            issues.append(f"{index_type} index names defined more than once: {', '.join(names)}")
+        return issues
+
+
+class FixedPositionResolver:
+    def __init__(self, indices_i7: pd.DataFrame, indices_i5: pd.DataFrame):
+        self.i7 = self._name_lookup(indices_i7, 'i7')
+        self.i5 = self._name_lookup(indices_i5, 'i5')
+        self.duplicate_names = {index_type: names for index_type, names in
+                                [('i7', self._duplicates(indices_i7, 'i7')), ('i5', self._duplicates(indices_i5, 'i5'))]
+                                if names}
+
+    @staticmethod
+    def _name_lookup(df: pd.DataFrame, index_type: str) -> Dict[str, str]:
+        if df.empty:
+            return {}
+        names, sequences = df[f'index_{index_type}_name'].astype(str), df[f'index_{index_type}']
+        return dict(zip(names[::-1], sequences[::-1]))
+
+    @staticmethod
+    def _duplicates(df: pd.DataFrame, index_type: str) -> List[str]:
+        if df.empty:
+            return []
+        names = df[f'index_{index_type}_name'].astype(str)
+        return names[names.duplicated()].unique().tolist()
+
+    def _split_dual(self, value: str) -> Tuple[str, str] | None:
+        i7_name, _, i5_name = value.partition('-')
+        if i7_name in self.i7 and i5_name in self.i5:
+            return i7_name, i5_name
+        for split in range(1, len(value) - 1):
+            if value[split] == '-' and value[:split] in self.i7 and value[split + 1:] in self.i5:
+                return value[:split], value[split + 1:]
+        return None
+
+    def resolve(self, fixed_resources: pd.DataFrame, strategy: str) -> FixedPositionResolution:
+        dual = strategy == "DualOnly"
+        rows, missing, seen_positions, duplicate_positions = [], [], set(), []
+
+        for pos, value in zip(fixed_resources['name'].astype(str), fixed_resources['value'].astype(str)):
+            if pos in seen_positions:
+                duplicate_positions.append(pos)
+            seen_positions.add(pos)
+
+            if dual:
+                names = self._split_dual(value)
+                if names is None:
+                    missing.append((pos, value))
+                    continue
+                rows.append((pos, names[0], self.i7[names[0]], names[1], self.i5[names[1]]))
+            elif value in self.i7:
+                rows.append((pos, value, self.i7[value]))
+            else:
+                missing.append((pos, value))
+
+        columns = ['fixed_pos', 'index_i7_name', 'index_i7'] + (['index_i5_name', 'index_i5'] if dual else [])
+        return FixedPositionResolution(pd.DataFrame(rows, columns=columns), missing, duplicate_positions,
+                                       self.duplicate_names)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from modules.export import illumina_kit_data, table_kit_data, user_info
+from modules.illumina_indexes import IlluminaFormatIndexKitDefinition
+from modules.kit_record import IndexKitRecord, KitCache
+from modules.kit_type import KitTypeFields
+from modules.validation import index_column_errors, override_cycles_errors, validate_kit_document
+
+MAX_BODY_SIZE = 32 * 1024 * 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class IndexApiServer:
+    def __init__(self, kit_type_fields: Dict[str, KitTypeFields], kit_dir: Path | None = None,
+                 host: str = '127.0.0.1', port: int = 0, cache_size: int = 64):
+        self.kit_type_fields = kit_type_fields
+        self.kit_dir = Path(kit_dir) if kit_dir else None
+        self.host = host
+        self.port = port
+        self.kit_cache = KitCache(maxsize=cache_size)
+        self._server: asyncio.AbstractServer | None = None
+        self._routes = {
+            ('POST', '/convert'): self._convert,
+            ('POST', '/validate'): self._validate,
+            ('GET', '/lookup'): self._lookup,
+            ('GET', '/kits'): self._kits,
+        }
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, target, body = await self._read_request(reader)
+            url = urlsplit(target)
+            handler = self._routes.get((method, url.path))
+            if handler is None:
+                known_path = any(path == url.path for _, path in self._routes)
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED if known_path else HTTPStatus.NOT_FOUND,
+                                f"No route for {method} {url.path}")
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, payload = HTTPStatus.OK, await handler(query, body)
+        except HttpError as e:
+            status, payload = e.status, {'error': str(e)}
+        except (ValueError, KeyError) as e:
+            status, payload = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except Exception as e:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+        await self._write_response(writer, status, payload)
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        try:
+            method, target, _ = request_line.split(' ', 2)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while (line := (await reader.readline()).decode('latin-1').strip()):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        content_length = int(headers.get('content-length', 0))
+        if content_length > MAX_BODY_SIZE:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(content_length) if content_length else b''
+        return method.upper(), target, body
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: HTTPStatus, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _json_body(body: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(body or b'{}')
+        except json.JSONDecodeError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid JSON body: {e}")
+        if not isinstance(request, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"JSON body must be an object, not {type(request).__name__}")
+        return request
+
+    @staticmethod
+    def _read_table(content: str) -> pd.DataFrame:
+        return pd.read_csv(StringIO(content), sep=None, engine='python', dtype=str)
+
+    async def _convert(self, query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        request = self._json_body(body)
+        return await asyncio.get_running_loop().run_in_executor(None, self._convert_sync, request)
+
+    def _convert_sync(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        content = request['content']
+        if not isinstance(content, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "content must be a string")
+        source = request.get('source', '<http>')
+        if request.get('format', 'tsv') == 'tsv':
+            ikd = IlluminaFormatIndexKitDefinition.from_text(content, keep_raw=False)
+            return illumina_kit_data(ikd, self.kit_type_fields, source, request.get('user', ''))
+
+        return table_kit_data(self._read_table(content), self.kit_type_fields, request['kit_type'],
+                              request.get('index_kit', {}), request.get('resource', {}),
+                              user_info(source, request.get('user', '')), bool(request.get('mixed_lengths')))
+
+    async def _validate(self, query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        request = self._json_body(body)
+        return await asyncio.get_running_loop().run_in_executor(None, self._validate_sync, request)
+
+    def _validate_sync(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if 'document' in request:
+            if not isinstance(request['document'], dict):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "document must be a JSON object")
+            errors = validate_kit_document(request['document'], self.kit_type_fields)
+            return {'valid': not errors, 'errors': errors}
+
+        if 'content' in request:
+            df = self._read_table(request['content'])
+        else:
+            df = pd.DataFrame({label: pd.Series(values, dtype=object)
+                               for label, values in request.get('indexes', {}).items()})
+
+        errors = index_column_errors(df, mixed_lengths=bool(request.get('mixed_lengths'))) if not df.empty else []
+        if resource := request.get('resource'):
+            errors += override_cycles_errors(resource, required=False)
+        return {'valid': not errors, 'errors': errors}
+
+    def _kit_paths(self, query: Dict[str, str]) -> List[Path]:
+        if self.kit_dir is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Server was started without a kit directory")
+        names = set(query['kits'].split(',')) if query.get('kits') else None
+        return [path for path in sorted(self.kit_dir.glob('*.tsv')) if names is None or path.stem in names]
+
+    async def _load_kits(self, query: Dict[str, str]) -> List[IndexKitRecord]:
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(loop.run_in_executor(None, self.kit_cache.get, path)
+                                      for path in self._kit_paths(query)))
+
+    async def _kits(self, query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        records = await self._load_kits(query)
+        return {'kits': [record.metadata.to_dict() for record in records]}
+
+    async def _lookup(self, query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        sequence = query.get('sequence', '')
+        if not sequence:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Missing sequence parameter")
+
+        records = await self._load_kits(query)
+        return {'sequence': sequence.upper(),
+                'matches': [match for record in records for match in record.find_sequence(sequence)]}
@@ -3,20 +3,36 @@ import pandas as pd
 from camel_converter import to_snake
 from io import StringIO
 
+from modules.combinatorial import CombinatorialIndexPairs
+from modules.fixed_positions import FIXED_POSITION_TYPE, FixedPositionResolver
+
 
 class IlluminaFormatIndexKitDefinition:
-    def __init__(self, ilmn_index_file_path: Path):
-        self.indata = self._ingest_index_file(ilmn_index_file_path)
+    def __init__(self, ilmn_index_file_path: Path | None, keep_raw: bool = True, content: str | None = None):
+        if content is None:
+            content = ilmn_index_file_path.read_text(encoding="utf-8")
+        self.indata = self._ingest_index_content(content)
         self.index_kit = self.indata['index_kit']
         self.supported_library_prep_kits = self.indata['supported_library_prep_kits']
         self.resources = self._get_resources()
+        self.fixed_position_issues = []
         self.indices_i7 = self._get_index_df(1, "i7")
         self.indices_i5 = self._get_index_df(2, "i5")
         self.indices_dual_fixed = self._get_fixed_index_df("DualOnly")
         self.indices_single_fixed = self._get_fixed_index_df("SingleOnly")
 
-    def _ingest_index_file(self, index_file: Path) -> dict:
-        sections = self._parse_sections(index_file)
+        if not keep_raw:
+            self.release_raw()
+
+    @classmethod
+    def from_text(cls, content: str, keep_raw: bool = True) -> 'IlluminaFormatIndexKitDefinition':
+        return cls(None, keep_raw, content)
+
+    def release_raw(self):
+        self.indata = None
+
+    def _ingest_index_content(self, content: str) -> dict:
+        sections = self._parse_sections(content)
         return {
             'index_kit': self._parse_index_kit(sections),
             'supported_library_prep_kits': sections.get('SupportedLibraryPrepKits', []),
@@ -25,10 +41,9 @@ class IlluminaFormatIndexKitDefinition:
         }
 
     @staticmethod
-    def _parse_sections(index_file: Path) -> dict:
+    def _parse_sections(content: str) -> dict:
         sections = {}
         current_section = None
-        content = index_file.read_text(encoding="utf-8")
 
         for line in content.splitlines():
             line = line.strip()
@@ -64,7 +79,7 @@ class IlluminaFormatIndexKitDefinition:
 
     def _get_resources(self) -> dict:
         other_resources = self.indata['resources'][
-            ~self.indata['resources']['type'].str.contains('FixedIndexPosition', na=False)
+            ~self.indata['resources']['type'].str.contains(FIXED_POSITION_TYPE, na=False)
         ].copy()
         other_resources['snake_name'] = other_resources['name'].apply(to_snake)
         return dict(zip(other_resources['snake_name'], other_resources['value']))
@@ -76,22 +91,14 @@ class IlluminaFormatIndexKitDefinition:
                 .reset_index(drop=True))
 
     def _get_fixed_index_df(self, strategy: str) -> pd.DataFrame:
-        if self.index_kit['index_strategy'] != strategy or not self.indata['resources']['type'].str.contains(
-                'FixedIndexPosition', na=False).any():
+        fixed_mask = self.indata['resources']['type'].str.contains(FIXED_POSITION_TYPE, na=False)
+        if self.index_kit.get('index_strategy') != strategy or not fixed_mask.any():
             return pd.DataFrame()
 
-        fixed_indices = self.indata['resources'][
-            self.indata['resources']['type'].str.contains('FixedIndexPosition', na=False)
-        ].rename(columns={'name': 'fixed_pos'})
-
-        if strategy == "DualOnly":
-            fixed_indices[['index_i7_name', 'index_i5_name']] = fixed_indices['value'].str.split('-', expand=True)
-            return (fixed_indices.drop(columns=['type', 'format', 'value'])
-                    .merge(self.indices_i7, on='index_i7_name')
-                    .merge(self.indices_i5, on='index_i5_name'))
-        else:  # SingleOnly
-            fixed_indices['index_i7_name'] = fixed_indices['value']
-            return fixed_indices.drop(columns=['type', 'format', 'value'])
+        resolver = FixedPositionResolver(self.indices_i7, self.indices_i5)
+        resolution = resolver.resolve(self.indata['resources'][fixed_mask], strategy)
+        self.fixed_position_issues = resolution.issues
+        return resolution.df
 
     @property
     def kit_type(self) -> str:
@@ -110,9 +117,22 @@ class IlluminaFormatIndexKitDefinition:
     def indices_df(self) -> pd.DataFrame:
         if not self.indices_dual_fixed.empty:
             return self.indices_dual_fixed
+        elif not self.indices_single_fixed.empty:
+            return self.indices_single_fixed
         elif not self.indices_i7.empty and not self.indices_i5.empty:
             return pd.concat([self.indices_i7, self.indices_i5], axis=1)
         elif not self.indices_i7.empty:
             return self.indices_i7
         else:
             return pd.DataFrame()
+
+    @property
+    def is_combinatorial(self) -> bool:
+        return (self.index_kit.get('index_strategy') == 'All'
+                and not self.indices_i7.empty and not self.indices_i5.empty)
+
+    @property
+    def index_pairs(self) -> CombinatorialIndexPairs | None:
+        if self.is_combinatorial:
+            return CombinatorialIndexPairs(self.indices_i7, self.indices_i5)
+        return None
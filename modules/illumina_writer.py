@@ -0,0 +1,127 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from modules.fixed_positions import FIXED_POSITION_TYPE
+
+INDEX_STRATEGIES = {
+    'fixed_dual_index': 'DualOnly',
+    'fixed_single_index': 'SingleOnly',
+    'standard_dual_index': 'All',
+    'standard_single_index': 'SingleOnly',
+}
+POSITION_FIELDS = ['pos_i7', 'pos_i5']
+INDEX_KIT_KEYS = [('Name', 'name'), ('DisplayName', 'display_name'), ('Version', 'version'),
+                  ('Description', 'description')]
+ADAPTER_RESOURCES = [('Adapter', 'adapter_read1'), ('AdapterRead2', 'adapter_read2')]
+
+
+def _kit_indices(indexes: Dict[str, List[Dict[str, Any]]]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    i7, i5 = {}, {}
+    for records in indexes.values():
+        for record in records:
+            for label, names in [('index_i7', i7), ('index_i5', i5)]:
+                name, sequence = record.get(f"{label}_name"), record.get(label)
+                if not name or not sequence:
+                    continue
+                known = names.setdefault(str(name), sequence)
+                if known.upper() != sequence.upper():
+                    raise ValueError(f"{label} name {name} is used for two sequences: {known} and {sequence}")
+    return i7, i5
+
+
+def _fixed_positions(kit_type: str, indexes: Dict[str, List[Dict[str, Any]]]) -> Iterator[Tuple[str, str]]:
+    for records in indexes.values():
+        for record in records:
+            if 'fixed_pos' not in record:
+                continue
+            value = (f"{record['index_i7_name']}-{record['index_i5_name']}" if kit_type == 'fixed_dual_index'
+                     else str(record['index_i7_name']))
+            yield str(record['fixed_pos']), value
+
+
+def iter_illumina_kit_lines(document: Dict[str, Any], index_strategy: str | None = None,
+                            library_prep_kits: Iterable[str] = ()) -> Iterator[str]:
+    resource, index_kit, indexes = document['resource'], document['index_kit'], document['indexes']
+    kit_type = resource['kit_type']
+    if any(field in record for records in indexes.values() for record in records for field in POSITION_FIELDS):
+        raise ValueError(f"Illumina index kit files cannot hold the {' / '.join(POSITION_FIELDS)} positions "
+                         f"of {kit_type} kits")
+    index_strategy = index_strategy or INDEX_STRATEGIES.get(kit_type)
+    if index_strategy is None:
+        raise ValueError(f"No Illumina index strategy for kit type: {kit_type}")
+
+    yield "[IndexKit]"
+    for key, field in INDEX_KIT_KEYS:
+        if index_kit.get(field):
+            yield f"{key}\t{index_kit[field]}"
+    yield f"IndexStrategy\t{index_strategy}"
+
+    if library_prep_kits := list(library_prep_kits):
+        yield ""
+        yield "[SupportedLibraryPrepKits]"
+        yield from library_prep_kits
+
+    yield ""
+    yield "[Resources]"
+    yield "Name\tType\tFormat\tValue"
+    for name, field in ADAPTER_RESOURCES:
+        if resource.get(field):
+            yield f"{name}\tstring\tstring\t{resource[field]}"
+    for position, value in _fixed_positions(kit_type, indexes):
+        yield f"{position}\t{FIXED_POSITION_TYPE}\tstring\t{value}"
+
+    yield ""
+    yield "[Indices]"
+    yield "Name\tSequence\tIndexReadNumber"
+    i7, i5 = _kit_indices(indexes)
+    for read_number, names in [(1, i7), (2, i5)]:
+        for name, sequence in names.items():
+            yield f"{name}\t{sequence}\t{read_number}"
+
+
+def write_illumina_kit(document: Dict[str, Any], output_path: Path, index_strategy: str | None = None,
+                       library_prep_kits: Iterable[str] = ()):
+    tmp_path = Path(f"{output_path}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='\n') as tsv_file:
+            for line in iter_illumina_kit_lines(document, index_strategy, library_prep_kits):
+                tsv_file.write(line + '\n')
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, output_path)
+
+
+def _convert_json_job(json_path: Path, output_path: Path) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        with open(json_path, 'r') as json_file:
+            write_illumina_kit(json.load(json_file), output_path)
+        error = None
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        error = f"{type(e).__name__}: {e}"
+    return {'file': str(json_path), 'output': None if error else str(output_path), 'error': error,
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+def convert_kit_jsons(json_paths: Iterable[Path], output_dir: Path,
+                      max_workers: int | None = None) -> List[Dict[str, Any]]:
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    json_paths, output_paths, used_names = list(json_paths), [], set()
+    if not json_paths:
+        return []
+    for json_path in json_paths:
+        name, n = Path(json_path).stem, 1
+        while name in used_names:
+            name, n = f"{Path(json_path).stem}_{n}", n + 1
+        used_names.add(name)
+        output_paths.append(output_dir / f"{name}.tsv")
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(json_paths)))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_convert_json_job, json_paths, output_paths, chunksize=8))
@@ -1,8 +1,10 @@
-from PySide6.QtCore import QRegularExpression
 from PySide6.QtGui import QValidator
 from PySide6.QtWidgets import QLineEdit, QComboBox, QFormLayout, QGroupBox
 from typing import Dict, Union
 
+from modules.resources import QVALIDATOR_STATES
+from modules.validation import index_kit_errors, name_state, version_state
+
 class IndexKitSettings(QGroupBox):
     def __init__(self):
         super().__init__()
@@ -40,36 +42,17 @@ class IndexKitSettings(QGroupBox):
         data_dict = {key: widget.text() if isinstance(widget, QLineEdit) else widget.currentText()
                      for key, widget in self.widgets.items()}
 
-        missing_required_fields = [item for item in ["name", "display_name", "version"] if not data_dict.get(item)]
-
-        if missing_required_fields:
-            raise ValueError(f"Missing required index kit fields: {', '.join(missing_required_fields)}")
+        if errors := index_kit_errors(data_dict):
+            raise ValueError(errors[0])
 
         return data_dict
 
 
 class VersionValidator(QValidator):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.regex = QRegularExpression(r'^(\d{1,3}\.){0,2}\d{1,3}$')
-
     def validate(self, input_string: str, pos: int) -> tuple:
-        if not input_string:
-            return QValidator.Acceptable, input_string, pos
-
-        match = self.regex.match(input_string)
-        if match.hasMatch():
-            return QValidator.Acceptable, input_string, pos
-
-        # Allow intermediate inputs
-        if self.regex.match(input_string + '0').hasMatch():
-            return QValidator.Intermediate, input_string, pos
-
-        return QValidator.Invalid, input_string, pos
+        return QVALIDATOR_STATES[version_state(input_string)], input_string, pos
 
 
 class NameValidator(QValidator):
     def validate(self, input_string: str, pos: int) -> tuple:
-        if not input_string or input_string.isalnum() or '_' in input_string:
-            return QValidator.Acceptable, input_string, pos
-        return QValidator.Invalid, input_string, pos
+        return QVALIDATOR_STATES[name_state(input_string)], input_string, pos
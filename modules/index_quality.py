@@ -0,0 +1,94 @@
+from typing import Any, Dict, Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.sequences import INVALID_CODE, PackedSequences
+from modules.validation import INDEX_LABELS, INDEX_SEQUENCE_REGEX
+
+QUALITY_METRICS = ['gc', 'homopolymer', 'dinucleotide_repeat', 'dark_start']
+GC_RANGE = (0.25, 0.75)
+HOMOPOLYMER_LIMIT = 3
+DINUCLEOTIDE_REPEAT_LIMIT = 2
+G_CODE, C_CODE = 2, 1
+
+
+def sequence_quality(sequences: Sequence[str | None]) -> Dict[str, np.ndarray]:
+    sequences = [seq if isinstance(seq, str) and INDEX_SEQUENCE_REGEX.match(seq) else '' for seq in sequences]
+    packed = PackedSequences(sequences)
+    matrix, lengths = packed.code_matrix(), packed.lengths
+    present = lengths > 0
+    valid = matrix != INVALID_CODE
+
+    gc_counts = ((matrix == G_CODE) | (matrix == C_CODE)).sum(axis=1)
+    gc = np.where(present, gc_counts / np.maximum(lengths, 1), np.nan)
+
+    homopolymer = np.ones(len(sequences), dtype=np.int64)
+    dinucleotide = np.zeros(len(sequences), dtype=np.int64)
+    run, repeat_run = np.zeros_like(homopolymer), np.zeros_like(homopolymer)
+    for col in range(1, matrix.shape[1]):
+        same = valid[:, col] & (matrix[:, col] == matrix[:, col - 1])
+        run = np.where(same, run + 1, 0)
+        np.maximum(homopolymer, run + 1, out=homopolymer)
+        if col >= 2:
+            repeat = valid[:, col] & (matrix[:, col] == matrix[:, col - 2]) & (matrix[:, col - 1] != matrix[:, col - 2])
+            repeat_run = np.where(repeat, repeat_run + 1, 0)
+            np.maximum(dinucleotide, repeat_run, out=dinucleotide)
+    homopolymer = np.where(present, homopolymer, 0)
+    dinucleotide = np.where(present, (dinucleotide + 2) // 2, 0)
+
+    dark_start = (matrix[:, 0] == G_CODE) & (matrix[:, 1] == G_CODE) if matrix.shape[1] >= 2 \
+        else np.zeros(len(sequences), dtype=bool)
+
+    return {'gc': gc, 'homopolymer': homopolymer, 'dinucleotide_repeat': dinucleotide, 'dark_start': dark_start,
+            'present': present}
+
+
+def index_quality(df: pd.DataFrame, labels: Iterable[str] = tuple(INDEX_LABELS)) -> pd.DataFrame:
+    labels = [label for label in labels if label in df.columns]
+    sequences = [value for label in labels for value in df[label].tolist()]
+    metrics = sequence_quality(sequences)
+
+    columns = {}
+    for n, label in enumerate(labels):
+        rows = slice(n * len(df), (n + 1) * len(df))
+        for metric in QUALITY_METRICS:
+            columns[f"{label}_{metric}"] = metrics[metric][rows]
+        columns[f"{label}_present"] = metrics['present'][rows]
+    return pd.DataFrame(columns, index=df.index)
+
+
+def quality_flags(quality: pd.DataFrame, label: str) -> Dict[str, np.ndarray]:
+    present = quality[f"{label}_present"].to_numpy()
+    gc = quality[f"{label}_gc"].to_numpy()
+    return {
+        'gc': present & ((gc < GC_RANGE[0]) | (gc > GC_RANGE[1])),
+        'homopolymer': quality[f"{label}_homopolymer"].to_numpy() > HOMOPOLYMER_LIMIT,
+        'dinucleotide_repeat': quality[f"{label}_dinucleotide_repeat"].to_numpy() > DINUCLEOTIDE_REPEAT_LIMIT,
+        'dark_start': quality[f"{label}_dark_start"].to_numpy(),
+    }
+
+
+def kit_quality_report(df: pd.DataFrame, labels: Iterable[str] = tuple(INDEX_LABELS)) -> Dict[str, Dict[str, Any]]:
+    labels = [label for label in labels if label in df.columns]
+    quality = index_quality(df, labels)
+    report = {}
+    for label in labels:
+        present = quality[f"{label}_present"].to_numpy()
+        if not present.any():
+            continue
+        gc = quality[f"{label}_gc"].to_numpy()[present]
+        flags = quality_flags(quality, label)
+        report[label] = {
+            'indexes': int(present.sum()),
+            'gc_min': round(float(gc.min()), 3),
+            'gc_mean': round(float(gc.mean()), 3),
+            'gc_max': round(float(gc.max()), 3),
+            'max_homopolymer': int(quality[f"{label}_homopolymer"].max()),
+            'max_dinucleotide_repeat': int(quality[f"{label}_dinucleotide_repeat"].max()),
+            'gc_outside_range': int(flags['gc'].sum()),
+            'long_homopolymers': int(flags['homopolymer'].sum()),
+            'dinucleotide_repeats': int(flags['dinucleotide_repeat'].sum()),
+            'dark_starts': int(flags['dark_start'].sum()),
+        }
+    return report
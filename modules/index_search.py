@@ -0,0 +1,79 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from modules.column_state import cell_value
+from modules.sequences import INVALID_CODE, encode_bases
+from modules.validation import INDEX_SEQUENCE_REGEX
+
+NGRAM = 3
+
+
+class TableSearchIndex:
+    def __init__(self, columns: Dict[Any, Sequence[str | None]], n_rows: int):
+        self.n_rows = n_rows
+        self._row_text: List[str] = [''] * n_rows
+        prefix_entries = []
+        ngrams: Dict[str, set] = {}
+        sequences: Dict[int, List[tuple]] = {}
+
+        for values in columns.values():
+            values = [cell_value(value) for value in values]
+            sequence_column = all(INDEX_SEQUENCE_REGEX.match(value) for value in values if value)
+            for row, value in enumerate(values):
+                if not value:
+                    continue
+                text = value.lower()
+                self._row_text[row] += '\x1f' + text
+                prefix_entries.append((text, row))
+                for start in range(len(text) - NGRAM + 1):
+                    ngrams.setdefault(text[start:start + NGRAM], set()).add(row)
+                if sequence_column:
+                    sequences.setdefault(len(value), []).append((value.upper(), row))
+
+        prefix_entries.sort()
+        self._prefix_keys = [text for text, _ in prefix_entries]
+        self._prefix_rows = [row for _, row in prefix_entries]
+        self._ngrams = {gram: np.fromiter(rows, dtype=np.int64) for gram, rows in ngrams.items()}
+        self._sequences = {length: (np.vstack([encode_bases(seq) for seq, _ in entries]),
+                                    np.array([row for _, row in entries], dtype=np.int64))
+                           for length, entries in sequences.items()}
+
+    def starts_with(self, query: str) -> np.ndarray:
+        query = query.lower()
+        start = bisect_left(self._prefix_keys, query)
+        end = bisect_left(self._prefix_keys, query + '\uffff', lo=start)
+        return np.unique(np.array(self._prefix_rows[start:end], dtype=np.int64))
+
+    def contains(self, query: str) -> np.ndarray:
+        query = query.lower()
+        if len(query) < NGRAM:
+            return np.array([row for row, text in enumerate(self._row_text) if query in text], dtype=np.int64)
+
+        candidates = None
+        for start in range(len(query) - NGRAM + 1):
+            rows = self._ngrams.get(query[start:start + NGRAM])
+            if rows is None:
+                return np.array([], dtype=np.int64)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        return np.array([row for row in candidates if query in self._row_text[row]], dtype=np.int64)
+
+    def within_mismatches(self, sequence: str, max_mismatches: int) -> np.ndarray:
+        if sequence == '' or len(sequence) not in self._sequences:
+            return np.array([], dtype=np.int64)
+        query = encode_bases(sequence.upper())
+        if (query == INVALID_CODE).any():
+            return np.array([], dtype=np.int64)
+
+        matrix, rows = self._sequences[len(sequence)]
+        return np.unique(rows[(matrix != query).sum(axis=1) <= max_mismatches])
+
+    def search(self, query: str, mode: str = 'contains', max_mismatches: int = 0) -> np.ndarray:
+        if not query:
+            return np.arange(self.n_rows)
+        if mode == 'starts with':
+            return self.starts_with(query)
+        if mode == 'mismatches':
+            return self.within_mismatches(query, max_mismatches)
+        return self.contains(query)
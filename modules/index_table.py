@@ -1,16 +1,29 @@
-import numpy as np
+import warnings
+from io import StringIO
+
 import pandas as pd
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QAction
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtGui import QAction, QBrush, QColor, QGuiApplication, QKeySequence
 from PySide6.QtWidgets import QWidget, QMenu, QHeaderView, QHBoxLayout, QVBoxLayout, QSpacerItem, QSizePolicy, \
-    QTableWidget, QTableWidgetItem
+    QTableWidget, QTableWidgetItem, QCheckBox
 
+from modules.column_state import IndexCollisionState, IndexColumnState
 from modules.draggable_labels import DraggableLabelsContainer
+from modules.export import clean_index_df, index_set_dict, override_cycles_length_groups
 from modules.index_kit import IndexKitSettings
+from modules.index_quality import index_quality, kit_quality_report
+from modules.index_search import TableSearchIndex
+from modules.quality_table import IndexQualityTable
 from modules.resources import ResourcesSettings
+from modules.search_bar import IndexSearchBar
 from modules.user import UserInfo
 from modules.notification import Toast
-from typing import Dict, Any, List
+from modules.validation import INDEX_LABELS, index_collision_errors, index_label_sets, invalid_index_rows, \
+    invalid_rows_message, index_lengths
+from typing import Dict, Any, Iterable, List, Tuple
+
+INVALID_CELL_BRUSH = QBrush(QColor(180, 10, 10, 110))
+VALIDATION_NOTICE_INTERVAL = 2000
 
 
 class IndexTableContainer(QWidget):
@@ -41,15 +54,55 @@ class IndexTableContainer(QWidget):
         self.input_settings_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
 
         self.draggable_labels_container = DraggableLabelsContainer(self.kit_type_fields)
+        self.search_bar = IndexSearchBar()
+        self._search_index = None
+        self.quality_checkbox = QCheckBox("quality columns")
+        self.quality_table = IndexQualityTable(self.tablewidget)
+        self.quality_table.setVisible(False)
+
+        self.search_layout = QHBoxLayout()
+        self.search_layout.addWidget(self.search_bar)
+        self.search_layout.addWidget(self.quality_checkbox)
+        self.table_layout = QHBoxLayout()
+        self.table_layout.addWidget(self.tablewidget, 3)
+        self.table_layout.addWidget(self.quality_table, 1)
+
+        self.column_states: Dict[int, IndexColumnState] = {}
+        self.collision_states: Dict[Tuple[str, ...], IndexCollisionState] = {}
+        self._rebuild_timer = QTimer(self)
+        self._rebuild_timer.setSingleShot(True)
+        self._rebuild_timer.setInterval(0)
+        self._notice_timer = QTimer(self)
+        self._notice_timer.setSingleShot(True)
+        self._notice_timer.setInterval(VALIDATION_NOTICE_INTERVAL)
 
         self.layout.addWidget(self.user_settings)
         self.layout.addLayout(self.input_settings_layout)
         self.layout.addWidget(self.draggable_labels_container)
-        self.layout.addWidget(self.tablewidget)
+        self.layout.addLayout(self.search_layout)
+        self.layout.addLayout(self.table_layout)
 
     def _connect_signals(self):
         self.resources_settings.widgets['kit_type'].currentTextChanged.connect(self.set_draggable_layout)
         self.tablewidget_h_header.label_dropped.connect(self._override_cycles_autoset_label)
+        self.resources_settings.mixed_lengths_checkbox.toggled.connect(self.override_cycles_autoset)
+        self.tablewidget.table_pasted.connect(self._table_pasted)
+        self.tablewidget.paste_failed.connect(lambda message: self.notify_signal.emit(message, True))
+        self.search_bar.search_changed.connect(self.apply_search)
+        self.quality_checkbox.toggled.connect(self._toggle_quality_columns)
+
+        self._rebuild_timer.timeout.connect(self.rebuild_validation_state)
+        self._notice_timer.timeout.connect(self._notify_validation)
+
+        model = self.tablewidget.model()
+        model.dataChanged.connect(self._cells_edited)
+        for signal in [model.rowsInserted, model.rowsRemoved, model.columnsInserted, model.columnsRemoved,
+                       model.modelReset, model.layoutChanged, self.tablewidget.cells_changed]:
+            signal.connect(self._invalidate_search_index)
+            signal.connect(self._rebuild_timer.start)
+        model.headerDataChanged.connect(self._rebuild_timer.start)
+        self.resources_settings.mixed_lengths_checkbox.toggled.connect(self._rebuild_timer.start)
+        self.resources_settings.widgets['kit_type'].currentTextChanged.connect(self._rebuild_timer.start)
 
     def illumina_set_parameters(self, ikd: Dict[str, Any]):
         self.resources_settings.set_layout_illumina(ikd.kit_type)
@@ -85,7 +138,7 @@ class IndexTableContainer(QWidget):
 
         for used_label in ['index_i7', 'index_i5']:
             if used_label in df.columns and self.valid_index_sequences(used_label, df):
-                index_length = df[used_label].str.len().unique()[0]
+                index_length = max(index_lengths(used_label, df))
                 widget_name = 'override_cycles_pattern_i1' if used_label == 'index_i7' else 'override_cycles_pattern_i2'
                 self.resources_settings.widgets[widget_name].setText(f"I{index_length}")
 
@@ -100,27 +153,20 @@ class IndexTableContainer(QWidget):
             self.tablewidget_h_header.restore_orig_header_for_label(label)
             return
 
-        index_length = df[label].str.len().unique()[0]
+        index_length = max(index_lengths(label, df))
         widget_name = 'override_cycles_pattern_i1' if label == 'index_i7' else 'override_cycles_pattern_i2'
         self.resources_settings.widgets[widget_name].setText(f"I{index_length}")
 
     def valid_index_sequences(self, label: str, df: pd.DataFrame) -> bool:
-        _df_tmp = df[label].replace('nan', np.nan).dropna()
-        valid_sequences = _df_tmp.astype(str).str.match(r'^[ACGTacgt]+$')
-        invalid_mask = ~valid_sequences
-        invalid_count = invalid_mask.sum()
-
-        if invalid_count > 0:
-            invalid_rows = [v + 1 for v in df.index[_df_tmp.index[invalid_mask]].tolist()]
-            self.notify_signal.emit(f"{label} data contains {invalid_count} invalid non-empty sequences. "
-                                    f"Invalid rows: {invalid_rows}", True)
+        invalid_rows = invalid_index_rows(label, df)
+
+        if invalid_rows:
+            self.notify_signal.emit(invalid_rows_message(label, invalid_rows), True)
             return False
         return True
 
     def valid_index_lengths(self, label: str, df: pd.DataFrame) -> bool:
-        _df_tmp = df[label].replace('nan', np.nan).dropna()
-        unique_lengths = _df_tmp.str.len().unique()
-        if len(unique_lengths) != 1:
+        if not self.resources_settings.mixed_lengths() and len(index_lengths(label, df)) != 1:
             self.notify_signal.emit(f"{label} column contains indexes of different lengths", True)
             return False
         return True
@@ -141,23 +187,174 @@ class IndexTableContainer(QWidget):
 
         kit_type_name = self.resources_settings.widgets['kit_type'].currentText()
         kit_type_object = self.kit_type_fields[kit_type_name]
+        if collision_errors := index_collision_errors(df, kit_type_object):
+            raise ValueError(collision_errors[0])
+
         return self.tablewidget.to_index_set_dict(kit_type_object)
 
+    def override_cycles_length_groups(self) -> Dict[str, Dict[str, str]]:
+        return override_cycles_length_groups(self.tablewidget.to_dataframe())
+
     def set_index_table_data(self, df: pd.DataFrame):
-        df = df.dropna(axis=1, how='all').loc[:, (df != '').any()]
-        self.tablewidget.setRowCount(df.shape[0])
-        self.tablewidget.setColumnCount(df.shape[1])
-        self.tablewidget.setHorizontalHeaderLabels(df.columns)
+        self.tablewidget.set_dataframe(clean_index_df(df))
+
+    def _table_pasted(self, new_table: bool):
+        if new_table:
+            self.override_preset()
+        self.override_cycles_autoset()
+
+    def search_index(self) -> TableSearchIndex:
+        if self._search_index is None:
+            self._search_index = TableSearchIndex(self.tablewidget.column_values(), self.tablewidget.rowCount())
+        return self._search_index
+
+    def _invalidate_search_index(self, *args):
+        self._search_index = None
+        if self.search_bar.search()[0]:
+            self.search_bar.search_changed.emit(*self.search_bar.search())
+
+    def apply_search(self, query: str, mode: str, max_mismatches: int):
+        n_rows = self.tablewidget.rowCount()
+        visible = [False] * n_rows
+        for row in self.search_index().search(query, mode, max_mismatches):
+            visible[row] = True
+
+        self.tablewidget.setUpdatesEnabled(False)
+        for row, row_visible in enumerate(visible):
+            if self.tablewidget.isRowHidden(row) == row_visible:
+                self.tablewidget.setRowHidden(row, not row_visible)
+        self.tablewidget.setUpdatesEnabled(True)
+        self.search_bar.set_match_count(sum(visible), n_rows)
+        if self.quality_table.isVisible():
+            self.quality_table.sync_hidden_rows()
+
+    def _quality_frame(self, rows: Iterable[int] | None = None) -> pd.DataFrame:
+        if rows is None:
+            return pd.DataFrame({state.label: state.values for state in self.column_states.values()},
+                                index=range(self.tablewidget.rowCount()))
+        rows = sorted(rows)
+        return pd.DataFrame({state.label: [state.values[row] if row < len(state) else None for row in rows]
+                             for state in self.column_states.values()}, index=rows)
+
+    def refresh_quality_columns(self, rows: Iterable[int] | None = None):
+        if not self.quality_checkbox.isChecked():
+            return
+        labels = [state.label for state in self.column_states.values()]
+        if rows is not None and self.quality_table.matches(labels):
+            self.quality_table.update_rows(index_quality(self._quality_frame(rows)))
+            return
+        df = self._quality_frame()
+        self.quality_table.set_quality(index_quality(df), list(df.columns))
+
+    def _toggle_quality_columns(self, checked: bool):
+        self.quality_table.setVisible(checked)
+        self.refresh_quality_columns()
+
+    def quality_report(self) -> Dict[str, Dict[str, Any]]:
+        return kit_quality_report(self._quality_frame())
+
+    def rebuild_validation_state(self):
+        self._rebuild_timer.stop()
+        columns = self.tablewidget.column_values()
+        headers = self.tablewidget.horizontalHeader().header_labels()
+        self.column_states = {col: IndexColumnState(label, columns[col])
+                              for col, label in enumerate(headers) if label in INDEX_LABELS}
+        states = {state.label: state for state in self.column_states.values()}
+        self.collision_states = {}
+        for labels in self._collision_label_sets():
+            if labels := tuple(label for label in labels if label in states):
+                self.collision_states[labels] = IndexCollisionState(
+                    labels, (self._collision_key(labels, row) for row in range(self.tablewidget.rowCount())))
+        self._highlight_cells(range(self.tablewidget.rowCount()), range(self.tablewidget.columnCount()))
+        self.refresh_quality_columns()
+
+    def _cells_edited(self, top_left, bottom_right, roles=()):
+        self._invalidate_search_index()
+        if self._rebuild_timer.isActive():
+            return
 
-        for i in range(df.shape[0]):
-            for j in range(df.shape[1]):
-                self.tablewidget.setItem(i, j, QTableWidgetItem(str(df.iat[i, j])))
+        changed_rows, edited_rows = set(), {}
+        for col in range(top_left.column(), bottom_right.column() + 1):
+            if state := self.column_states.get(col):
+                for row in range(top_left.row(), bottom_right.row() + 1):
+                    item = self.tablewidget.item(row, col)
+                    if rows := state.update(row, item.text() if item else None):
+                        changed_rows |= rows
+                        edited_rows.setdefault(state.label, set()).add(row)
+
+        if changed_rows:
+            self.refresh_quality_columns(changed_rows)
+            for labels, collision_state in self.collision_states.items():
+                for row in set().union(*(edited_rows.get(label, set()) for label in labels)):
+                    changed_rows |= collision_state.update(row, self._collision_key(labels, row))
+            self._highlight_cells(changed_rows, self.column_states)
+            if not self._notice_timer.isActive():
+                self._notice_timer.start()
+
+    def _collision_label_sets(self) -> List[List[str]]:
+        kit_type_obj = self.kit_type_fields.get(self.resources_settings.widgets['kit_type'].currentText())
+        if kit_type_obj is None:
+            return [list(INDEX_LABELS)]
+        return index_label_sets(kit_type_obj)
+
+    def _collision_key(self, labels: Tuple[str, ...], row: int) -> Tuple[str, ...] | None:
+        states = {state.label: state for state in self.column_states.values()}
+        values = [states[label].values[row] if row < len(states[label]) else None for label in labels]
+        if any(not value or row in states[label].invalid_rows for label, value in zip(labels, values)):
+            return None
+        return tuple(value.upper() for value in values)
+
+    def cell_error(self, row: int, col: int) -> str | None:
+        if (state := self.column_states.get(col)) is None:
+            return None
+        if error := state.cell_error(row, self.resources_settings.mixed_lengths()):
+            return error
+        for labels, collision_state in self.collision_states.items():
+            if state.label in labels and row in collision_state.colliding_rows:
+                return f"{' + '.join(labels)} matches another row's index or the start of a longer one"
+        return None
+
+    def _highlight_cells(self, rows: Iterable[int], columns: Iterable[int]):
+        columns = list(columns)
+        model = self.tablewidget.model()
+        signals_blocked = model.blockSignals(True)
+        try:
+            for row in rows:
+                for col in columns:
+                    item = self.tablewidget.item(row, col)
+                    error = self.cell_error(row, col)
+                    if item is None or (item.data(Qt.ToolTipRole) or None) == error:
+                        continue
+                    item.setData(Qt.ToolTipRole, error or '')
+                    item.setData(Qt.BackgroundRole, INVALID_CELL_BRUSH if error else QBrush())
+        finally:
+            model.blockSignals(signals_blocked)
+            self.tablewidget.viewport().update()
+
+    def _validation_errors(self) -> List[str]:
+        mixed_lengths = self.resources_settings.mixed_lengths()
+        errors = [error for state in self.column_states.values() for error in state.errors(mixed_lengths)]
+        return errors + [state.message() for state in self.collision_states.values() if state.colliding_rows]
+
+    def _notify_validation(self):
+        if errors := self._validation_errors():
+            self.notify_signal.emit('\n'.join(errors), True)
 
     def set_draggable_layout(self):
         text = self.resources_settings.widgets['kit_type'].currentText()
         self.draggable_labels_container.show_labels(text)
 
 
+def parse_clipboard_table(text: str, header: bool) -> pd.DataFrame:
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', pd.errors.ParserWarning)
+        try:
+            return pd.read_csv(StringIO(text), sep='\t', header=0 if header else None, index_col=False, dtype=str,
+                               keep_default_na=False, skip_blank_lines=True)
+        except pd.errors.ParserWarning:
+            raise pd.errors.ParserError("Pasted rows have more cells than the header row")
+
+
 class DroppableHeader(QHeaderView):
     label_dropped = Signal(int, str)
 
@@ -221,11 +418,17 @@ class DroppableHeader(QHeaderView):
             menu = QMenu(self)
             action1 = QAction("Restore original header", self)
             action2 = QAction("Hide column", self)
+            action3 = QAction("Sort ascending", self)
+            action4 = QAction("Sort descending", self)
             menu.addAction(action1)
             menu.addAction(action2)
+            menu.addAction(action3)
+            menu.addAction(action4)
 
             action1.triggered.connect(lambda: self.restore_orig_header_for_index(header_index))
-            action2.triggered.connect(lambda: self.setSectionHidden(header_index, True))
+            action2.triggered.connect(lambda: self.parent().hide_column(header_index))
+            action3.triggered.connect(lambda: self.parent().sortItems(header_index, Qt.AscendingOrder))
+            action4.triggered.connect(lambda: self.parent().sortItems(header_index, Qt.DescendingOrder))
 
             menu.exec(event.globalPos())
         else:
@@ -233,30 +436,110 @@ class DroppableHeader(QHeaderView):
 
 
 class DroppableTableWidget(QTableWidget):
+    table_pasted = Signal(bool)
+    paste_failed = Signal(str)
+    cells_changed = Signal()
+    columns_hidden = Signal()
+
     def __init__(self, rows, columns, parent=None):
         super().__init__(rows, columns, parent)
         self.setHorizontalHeader(DroppableHeader(Qt.Horizontal, self))
         self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Paste):
+            self.paste_from_clipboard()
+        else:
+            super().keyPressEvent(event)
+
     def contextMenuEvent(self, event):
         header_index = self.horizontalHeader().logicalIndexAt(event.pos())
         if header_index != -1:
             menu = QMenu(self)
             action1 = QAction("Restore original header", self)
             action2 = QAction("Hide column", self)
+            action3 = QAction("Paste", self)
+            action4 = QAction("Sort ascending", self)
+            action5 = QAction("Sort descending", self)
             menu.addAction(action1)
             menu.addAction(action2)
+            menu.addAction(action3)
+            menu.addAction(action4)
+            menu.addAction(action5)
 
             action1.triggered.connect(lambda: self.horizontalHeader().restore_orig_header_for_index(header_index))
-            action2.triggered.connect(lambda: self.hideColumn(header_index))
+            action2.triggered.connect(lambda: self.hide_column(header_index))
+            action3.triggered.connect(self.paste_from_clipboard)
+            action4.triggered.connect(lambda: self.sortItems(header_index, Qt.AscendingOrder))
+            action5.triggered.connect(lambda: self.sortItems(header_index, Qt.DescendingOrder))
 
             menu.exec(event.globalPos())
         else:
             super().contextMenuEvent(event)
 
+    def paste_from_clipboard(self):
+        text = QGuiApplication.clipboard().text()
+        if not text.strip():
+            return
+
+        current = self.currentIndex()
+        new_table = self.columnCount() == 0 or not current.isValid()
+        try:
+            df = parse_clipboard_table(text, header=new_table)
+        except pd.errors.ParserError as e:
+            self.paste_failed.emit(f"Could not paste the clipboard table: {e}".strip())
+            return
+
+        if new_table:
+            self.set_dataframe(df)
+        else:
+            self.set_cells(df, current.row(), current.column())
+        self.table_pasted.emit(new_table)
+
+    def set_dataframe(self, df: pd.DataFrame):
+        self.clearContents()
+        self.setRowCount(0)
+        self.setColumnCount(df.shape[1])
+        self.setHorizontalHeaderLabels([str(label) for label in df.columns])
+        self.horizontalHeader().original_labels.clear()
+        self.set_cells(df)
+
+    def set_cells(self, df: pd.DataFrame, row: int = 0, column: int = 0):
+        sorting_enabled = self.isSortingEnabled()
+        self.setSortingEnabled(False)
+        self.setUpdatesEnabled(False)
+
+        n_columns = self.columnCount()
+        self.setRowCount(max(self.rowCount(), row + df.shape[0]))
+        self.setColumnCount(max(n_columns, column + df.shape[1]))
+        for col in range(n_columns, self.columnCount()):
+            self.setHorizontalHeaderItem(col, QTableWidgetItem(str(col + 1)))
+
+        model = self.model()
+        signals_blocked = model.blockSignals(True)
+        try:
+            for i, values in enumerate(df.itertuples(index=False, name=None), start=row):
+                for j, value in enumerate(values, start=column):
+                    self.setItem(i, j, QTableWidgetItem(str(value)))
+        finally:
+            model.blockSignals(signals_blocked)
+            self.setSortingEnabled(sorting_enabled)
+            self.setUpdatesEnabled(True)
+            self.viewport().update()
+        self.cells_changed.emit()
+
+    def hide_column(self, column: int):
+        self.hideColumn(column)
+        self.columns_hidden.emit()
+
     def show_all_columns(self):
         for column in range(self.columnCount()):
             self.setColumnHidden(column, False)
+        self.columns_hidden.emit()
+
+    def column_values(self) -> Dict[int, List[str | None]]:
+        return {col: [item.text() if (item := self.item(row, col)) else None for row in range(self.rowCount())]
+                for col in range(self.columnCount())}
 
     def to_dataframe(self) -> pd.DataFrame:
         rows, columns = self.rowCount(), self.columnCount()
@@ -271,16 +554,4 @@ class DroppableTableWidget(QTableWidget):
         return pd.DataFrame(data)
 
     def to_index_set_dict(self, kit_type_obj) -> Dict[str, List[Dict[str, Any]]]:
-        df = self.to_dataframe()
-        index_set_dict = {}
-
-        for set_name in kit_type_obj.index_set_names:
-            fields = kit_type_obj.index_set_fields(set_name)
-            _df = df[fields].copy().replace(['nan', ''], np.nan).dropna(how='all')
-
-            if _df.isnull().any().any():
-                raise ValueError(f"Error: NaN values in the index table for {set_name}")
-            else:
-                index_set_dict[set_name] = _df.to_dict(orient='records')
-
-        return index_set_dict
+        return index_set_dict(self.to_dataframe(), kit_type_obj)
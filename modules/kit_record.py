@@ -0,0 +1,196 @@
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.illumina_indexes import IlluminaFormatIndexKitDefinition
+from modules.sequences import PackedSequences
+
+
+class KitMetadata:
+    __slots__ = ('name', 'display_name', 'version', 'description', 'index_strategy', 'kit_type',
+                 'adapter_read1', 'adapter_read2')
+
+    def __init__(self, **fields: str):
+        for field in self.__slots__:
+            value = fields.get(field)
+            setattr(self, field, sys.intern(str(value)) if value is not None else '')
+
+    @classmethod
+    def from_definition(cls, ikd: IlluminaFormatIndexKitDefinition) -> 'KitMetadata':
+        return cls(**{key: ikd.index_kit.get(key) for key in
+                      ['name', 'display_name', 'version', 'description', 'index_strategy']},
+                   kit_type=ikd.kit_type,
+                   adapter_read1=ikd.resources.get('adapter'),
+                   adapter_read2=ikd.resources.get('adapter_read2'))
+
+    def to_dict(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class IndexKitRecord:
+    __slots__ = ('metadata', 'i7_names', 'i7_sequences', 'i5_names', 'i5_sequences',
+                 'fixed_positions', 'fixed_i7_rows', 'fixed_i5_rows')
+
+    def __init__(self, metadata: KitMetadata,
+                 i7: Tuple[Iterable[str], Iterable[str]],
+                 i5: Tuple[Iterable[str], Iterable[str]],
+                 fixed: Tuple[Iterable[str], Iterable[int], Iterable[int]] = ((), (), ())):
+        self.metadata = metadata
+        self.i7_names = tuple(sys.intern(str(name)) for name in i7[0])
+        self.i7_sequences = PackedSequences(i7[1])
+        self.i5_names = tuple(sys.intern(str(name)) for name in i5[0])
+        self.i5_sequences = PackedSequences(i5[1])
+        self.fixed_positions = tuple(sys.intern(str(pos)) for pos in fixed[0])
+        self.fixed_i7_rows = np.asarray(fixed[1], dtype=np.int32)
+        self.fixed_i5_rows = np.asarray(fixed[2], dtype=np.int32)
+
+    @classmethod
+    def from_definition(cls, ikd: IlluminaFormatIndexKitDefinition) -> 'IndexKitRecord':
+        i7_names = ikd.indices_i7.get('index_i7_name', pd.Series(dtype=str)).tolist()
+        i5_names = ikd.indices_i5.get('index_i5_name', pd.Series(dtype=str)).tolist()
+        i7_sequences = ikd.indices_i7.get('index_i7', pd.Series(dtype=str)).tolist()
+        i5_sequences = ikd.indices_i5.get('index_i5', pd.Series(dtype=str)).tolist()
+
+        fixed_df = ikd.indices_dual_fixed if not ikd.indices_dual_fixed.empty else ikd.indices_single_fixed
+        if fixed_df.empty:
+            fixed = ((), (), ())
+        else:
+            i7_rows = {name: row for row, name in enumerate(i7_names)}
+            i5_rows = {name: row for row, name in enumerate(i5_names)}
+            fixed = (fixed_df['fixed_pos'].tolist(),
+                     [i7_rows.get(name, -1) for name in fixed_df['index_i7_name']],
+                     [i5_rows.get(name, -1) for name in fixed_df['index_i5_name']]
+                     if 'index_i5_name' in fixed_df else [-1] * len(fixed_df))
+
+        return cls(KitMetadata.from_definition(ikd), (i7_names, i7_sequences), (i5_names, i5_sequences), fixed)
+
+    @classmethod
+    def from_file(cls, ilmn_index_file_path: Path) -> 'IndexKitRecord':
+        return cls.from_definition(IlluminaFormatIndexKitDefinition(ilmn_index_file_path, keep_raw=False))
+
+    @property
+    def name(self) -> str:
+        return self.metadata.name
+
+    @property
+    def kit_type(self) -> str:
+        return self.metadata.kit_type
+
+    @property
+    def nbytes(self) -> int:
+        names = self.i7_names + self.i5_names + self.fixed_positions
+        return (sum(sys.getsizeof(name) for name in set(names)) + 8 * len(names)
+                + self.i7_sequences.nbytes + self.i5_sequences.nbytes
+                + self.fixed_i7_rows.nbytes + self.fixed_i5_rows.nbytes)
+
+    def find_sequence(self, sequence: str) -> List[Dict[str, str]]:
+        sequence = sequence.upper()
+        return [{'kit': self.name, 'index': index, 'name': names[row]}
+                for index, names, sequences in (('i7', self.i7_names, self.i7_sequences),
+                                                ('i5', self.i5_names, self.i5_sequences))
+                for row, candidate in enumerate(sequences.to_list()) if candidate == sequence]
+
+    def i7_df(self) -> pd.DataFrame:
+        return pd.DataFrame({'index_i7_name': self.i7_names, 'index_i7': self.i7_sequences.to_list()})
+
+    def i5_df(self) -> pd.DataFrame:
+        return pd.DataFrame({'index_i5_name': self.i5_names, 'index_i5': self.i5_sequences.to_list()})
+
+    def fixed_df(self) -> pd.DataFrame:
+        df = pd.DataFrame({'fixed_pos': self.fixed_positions})
+        df['index_i7_name'], df['index_i7'] = self._fixed_columns(self.i7_names, self.i7_sequences, self.fixed_i7_rows)
+        if (self.fixed_i5_rows >= 0).any():
+            df['index_i5_name'], df['index_i5'] = self._fixed_columns(self.i5_names, self.i5_sequences,
+                                                                      self.fixed_i5_rows)
+        return df
+
+    @staticmethod
+    def _fixed_columns(names: Tuple[str, ...], sequences: PackedSequences,
+                       rows: np.ndarray) -> Tuple[List[str], List[str]]:
+        sequence_list = sequences.to_list()
+        return ([names[row] if row >= 0 else None for row in rows],
+                [sequence_list[row] if row >= 0 else None for row in rows])
+
+    @property
+    def indices_df(self) -> pd.DataFrame:
+        if self.fixed_positions:
+            return self.fixed_df()
+        elif self.i7_names and self.i5_names:
+            return pd.concat([self.i7_df(), self.i5_df()], axis=1)
+        elif self.i7_names:
+            return self.i7_df()
+        else:
+            return pd.DataFrame()
+
+
+class IndexKitLibrary:
+    def __init__(self, records: Iterable[IndexKitRecord] = ()):
+        self._records: Dict[str, IndexKitRecord] = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: IndexKitRecord):
+        self._records[record.name] = record
+
+    def load(self, ilmn_index_file_paths: Iterable[Path]) -> 'IndexKitLibrary':
+        for file_path in ilmn_index_file_paths:
+            self.add(IndexKitRecord.from_file(Path(file_path)))
+        return self
+
+    def __getitem__(self, name: str) -> IndexKitRecord:
+        return self._records[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._records
+
+    def __iter__(self) -> Iterator[IndexKitRecord]:
+        return iter(self._records.values())
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(record.nbytes for record in self)
+
+
+class KitCache:
+    def __init__(self, loader: Callable[[Path], Any] = IndexKitRecord.from_file, maxsize: int = 64):
+        self.loader = loader
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Tuple[Path, int, int], Any] = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(file_path: Path) -> Tuple[Path, int, int]:
+        file_path = Path(file_path).resolve()
+        stat = file_path.stat()
+        return file_path, stat.st_size, stat.st_mtime_ns
+
+    def get(self, file_path: Path) -> Any:
+        key = self._key(file_path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = self.loader(key[0])
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
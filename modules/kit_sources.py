@@ -0,0 +1,51 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+import pandas as pd
+
+from modules.illumina_indexes import IlluminaFormatIndexKitDefinition
+from modules.kit_record import KitCache
+from modules.sample_sheet_import import ImportedSampleSheet, is_sample_sheet, read_sample_sheet
+
+
+def detect_delimiter(file_path: Path) -> str:
+    with open(file_path, 'r') as csvfile:
+        content = csvfile.read()
+        dialect = csv.Sniffer().sniff(content)
+
+        return dialect.delimiter
+
+
+def read_index_csv(file_path: Path) -> pd.DataFrame:
+    return pd.read_csv(file_path, sep=detect_delimiter(file_path))
+
+
+def load_kit_source(file_path: Path) -> IlluminaFormatIndexKitDefinition | ImportedSampleSheet | pd.DataFrame:
+    if Path(file_path).suffix.lower() == '.tsv':
+        return IlluminaFormatIndexKitDefinition(Path(file_path), keep_raw=False)
+    if is_sample_sheet(file_path):
+        return read_sample_sheet(file_path)
+    return read_index_csv(file_path)
+
+
+def kit_source_cache(maxsize: int = 64) -> KitCache:
+    return KitCache(loader=load_kit_source, maxsize=maxsize)
+
+
+def _load_or_error(cache: KitCache, file_path: Path) -> Any:
+    try:
+        return cache.get(file_path)
+    except Exception as e:
+        return e
+
+
+def load_kit_sources(file_paths: Iterable[Path], cache: KitCache,
+                     max_workers: int | None = None) -> Dict[Path, Any]:
+    file_paths = [Path(file_path) for file_path in file_paths]
+    if len(file_paths) < 2:
+        return {file_path: _load_or_error(cache, file_path) for file_path in file_paths}
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, len(file_paths))) as executor:
+        return dict(zip(file_paths, executor.map(partial(_load_or_error, cache), file_paths)))
@@ -1,5 +1,8 @@
+from pathlib import Path
 from typing import Dict, List, Union
 
+import yaml
+
 
 class KitTypeFields:
     def __init__(self, kit_type_data: Dict[str, List[Dict[str, Union[str, List[str]]]]]):
@@ -36,3 +39,9 @@ class KitTypeFields:
                 return container.get('name', '')
         return ''
 
+
+def load_kit_type_fields(file_path: Path) -> Dict[str, KitTypeFields]:
+    with open(file_path, 'r') as file:
+        yaml_data = yaml.safe_load(file)
+
+    return {kit_type: KitTypeFields({kit_type: data}) for kit_type, data in yaml_data.items()}
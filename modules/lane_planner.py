@@ -0,0 +1,266 @@
+import copy
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from modules.sample_sheet import DEFAULT_MIN_DISTANCE, SampleSheetBuilder
+from modules.sequences import INVALID_CODE, PackedSequences, hamming_matrix
+from modules.validation import row_summary
+
+GROUP_COLUMNS = ['group', 'sample_project']
+KIT_COLUMN = 'kit'
+# two-colour SBS: A is seen in both channels, C only in red, T only in green and G in neither
+RED_CODES = [0, 1]
+GREEN_CODES = [0, 3]
+
+
+class SampleGroup(NamedTuple):
+    name: str
+    kit: str
+    rows: List[Dict[str, str]]
+    i7: List[str]
+    i5: List[str | None]
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    @property
+    def lengths(self) -> frozenset:
+        return frozenset((len(i7), len(i5) if i5 else 0) for i7, i5 in zip(self.i7, self.i5))
+
+
+def _code_matrix(sequences: List[str | None], width: int) -> np.ndarray:
+    return PackedSequences([seq or '' for seq in sequences]).padded_code_matrix(width)
+
+
+class KitDistances:
+    def __init__(self, groups: List[SampleGroup]):
+        self.groups = groups
+        width7 = max((len(seq) for group in groups for seq in group.i7), default=0)
+        width5 = max((len(seq or '') for group in groups for seq in group.i5), default=0)
+        self.i7 = {kit: _code_matrix(sum((g.i7 for g in groups if g.kit == kit), []), width7) for kit in self.kits}
+        self.i5 = {kit: _code_matrix(sum((g.i5 for g in groups if g.kit == kit), []), width5) for kit in self.kits}
+        self.has_i5 = {kit: np.array([bool(i5) for g in groups if g.kit == kit for i5 in g.i5]) for kit in self.kits}
+
+    @property
+    def kits(self) -> List[str]:
+        return list(dict.fromkeys(group.kit for group in self.groups))
+
+    def _group_offsets(self, kit: str) -> Tuple[List[int], np.ndarray]:
+        members = [g for g, group in enumerate(self.groups) if group.kit == kit]
+        sizes = [self.groups[g].size for g in members]
+        return members, np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    def sample_distances(self, kit_a: str, kit_b: str) -> np.ndarray:
+        distance = hamming_matrix(self.i7[kit_a], self.i7[kit_b])
+        dual = self.has_i5[kit_a][:, None] & self.has_i5[kit_b][None, :]
+        if dual.any():
+            distance = np.where(dual, np.maximum(distance, hamming_matrix(self.i5[kit_a], self.i5[kit_b])), distance)
+        return distance
+
+    def group_min_distances(self) -> np.ndarray:
+        result = np.full((len(self.groups), len(self.groups)), np.iinfo(np.int16).max, dtype=np.int16)
+        offsets = {kit: self._group_offsets(kit) for kit in self.kits}
+        for n, kit_a in enumerate(self.kits):
+            for kit_b in self.kits[n:]:
+                distance = self.sample_distances(kit_a, kit_b)
+                if kit_a == kit_b:
+                    np.fill_diagonal(distance, np.iinfo(np.int16).max)
+                (members_a, starts_a), (members_b, starts_b) = offsets[kit_a], offsets[kit_b]
+                reduced = np.minimum.reduceat(np.minimum.reduceat(distance, starts_a, axis=0), starts_b, axis=1)
+                result[np.ix_(members_a, members_b)] = reduced
+                result[np.ix_(members_b, members_a)] = reduced.T
+        return result
+
+
+class Lane:
+    def __init__(self, number: int, capacity: int | None, n_groups: int, width7: int, width5: int):
+        self.number = number
+        self.capacity = capacity
+        self.groups: List[int] = []
+        self.samples = 0
+        self.lengths: frozenset = frozenset()
+        self.blocked = np.zeros(n_groups, dtype=bool)
+        self.signal = {'i7': np.zeros((3, width7), dtype=bool), 'i5': np.zeros((3, width5), dtype=bool)}
+
+    def load(self) -> float:
+        return self.samples / self.capacity if self.capacity else self.samples
+
+    def fits(self, group: int, size: int, lengths: frozenset, mixed_lengths: bool) -> str | None:
+        if self.capacity is not None and self.samples + size > self.capacity:
+            return "capacity"
+        if self.groups and not mixed_lengths and lengths != self.lengths:
+            return "index lengths"
+        if self.blocked[group]:
+            return "index distance"
+        return None
+
+    def dark_cycles(self, signal: Dict[str, np.ndarray] | None = None) -> int:
+        signal = signal or self.signal
+        return sum(int((s[0] & ~(s[1] & s[2])).sum()) for s in signal.values())
+
+    def merged_signal(self, signal: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return {read: self.signal[read] | signal[read] for read in self.signal}
+
+    def add(self, group: int, size: int, lengths: frozenset, blocked: np.ndarray, signal: Dict[str, np.ndarray]):
+        self.groups.append(group)
+        self.samples += size
+        self.lengths = self.lengths | lengths
+        self.blocked |= blocked
+        for read, s in signal.items():
+            self.signal[read] |= s
+
+
+def _color_signal(matrix: np.ndarray) -> np.ndarray:
+    return np.vstack([(matrix != INVALID_CODE).any(axis=0), np.isin(matrix, RED_CODES).any(axis=0),
+                      np.isin(matrix, GREEN_CODES).any(axis=0)])
+
+
+def _seed_lane(empty: Lane, waiting: List[int], groups: List[SampleGroup], conflicts: np.ndarray,
+               signals: List[Dict[str, np.ndarray]], mixed_lengths: bool, max_dark_cycles: int) -> Lane | None:
+    for seed in waiting:
+        lane = copy.deepcopy(empty)
+        lane.add(seed, groups[seed].size, groups[seed].lengths, conflicts[seed], signals[seed])
+        while lane.dark_cycles() > max_dark_cycles:
+            options = [(lane.dark_cycles(lane.merged_signal(signals[g])), -groups[g].size, g) for g in waiting
+                       if g not in lane.groups and not lane.fits(g, groups[g].size, groups[g].lengths, mixed_lengths)]
+            if not options:
+                break
+            g = min(options)[2]
+            lane.add(g, groups[g].size, groups[g].lengths, conflicts[g], signals[g])
+        if lane.dark_cycles() <= max_dark_cycles:
+            return lane
+    return None
+
+
+def plan_lanes(groups: List[SampleGroup], capacities: List[int | None], min_distance: int = DEFAULT_MIN_DISTANCE,
+               mixed_lengths: bool = False, max_dark_cycles: int | None = None) -> Dict[str, Any]:
+    if not groups:
+        return {'lanes': [], 'placed': {}, 'unplaced': {}}
+    distances = KitDistances(groups)
+    group_distance = distances.group_min_distances()
+    conflicts = group_distance < min_distance
+
+    width7, width5 = next(iter(distances.i7.values())).shape[1], next(iter(distances.i5.values())).shape[1]
+    lanes = [Lane(n, capacity, len(groups), width7, width5) for n, capacity in enumerate(capacities, start=1)]
+    signals, offsets = [], {kit: 0 for kit in distances.kits}
+    for group in groups:
+        start, offsets[group.kit] = offsets[group.kit], offsets[group.kit] + group.size
+        signals.append({'i7': _color_signal(distances.i7[group.kit][start:start + group.size]),
+                        'i5': _color_signal(distances.i5[group.kit][start:start + group.size])})
+
+    placed: Dict[int, int] = {}
+    unplaced: Dict[str, str] = {}
+    pending = sorted(range(len(groups)), key=lambda g: -groups[g].size)
+    while pending:
+        # groups kept out of a lane by dark cycles are retried once other groups have filled the lanes
+        waiting = []
+        for g in pending:
+            group = groups[g]
+            if conflicts[g, g]:
+                unplaced[group.name] = f"indexes within the group are closer than {min_distance} mismatches"
+                continue
+            reasons, candidates = [], []
+            for lane in lanes:
+                if reason := lane.fits(g, group.size, group.lengths, mixed_lengths):
+                    reasons.append(reason)
+                    continue
+                dark = lane.dark_cycles(lane.merged_signal(signals[g]))
+                if max_dark_cycles is not None and dark > max_dark_cycles:
+                    reasons.append("dark cycles")
+                    continue
+                candidates.append((dark - lane.dark_cycles() - lane.dark_cycles(signals[g]), lane.load(),
+                                   lane.number, lane))
+            if not candidates:
+                unplaced[group.name] = f"no lane fits ({', '.join(sorted(set(reasons)))})"
+                if "dark cycles" in reasons:
+                    waiting.append(g)
+                continue
+            lane = min(candidates, key=lambda candidate: candidate[:3])[3]
+            lane.add(g, group.size, group.lengths, conflicts[g], signals[g])
+            placed[g] = lane.number
+            unplaced.pop(group.name, None)
+
+        if waiting and len(waiting) == len(pending):
+            # no waiting group balances an existing lane: start an empty lane with several of them together
+            empty = next((lane for lane in lanes if not lane.groups), None)
+            if not empty or not (seeded := _seed_lane(empty, waiting, groups, conflicts, signals, mixed_lengths,
+                                                      max_dark_cycles)):
+                break
+            lanes[lanes.index(empty)] = seeded
+            for g in seeded.groups:
+                placed[g] = seeded.number
+                unplaced.pop(groups[g].name)
+            waiting = [g for g in waiting if g not in seeded.groups]
+        pending = waiting
+
+    plan = []
+    for lane in lanes:
+        lane_distance = int(group_distance[np.ix_(lane.groups, lane.groups)].min(initial=np.iinfo(np.int16).max))
+        plan.append({'lane': lane.number, 'capacity': lane.capacity, 'samples': lane.samples,
+                     'groups': [groups[g].name for g in lane.groups],
+                     'min_distance': lane_distance if lane_distance < np.iinfo(np.int16).max else None,
+                     'index_lengths': sorted(lane.lengths), 'dark_cycles': lane.dark_cycles()})
+    return {'lanes': plan, 'placed': {groups[g].name: lane for g, lane in placed.items()}, 'unplaced': unplaced}
+
+
+def read_sample_groups(manifest_path: Path) -> Tuple[List[str], List[SampleGroup]]:
+    manifest_path = Path(manifest_path)
+    builders: Dict[str, SampleSheetBuilder] = {}
+    groups: Dict[str, SampleGroup] = {}
+    errors: List[str] = []
+    with open(manifest_path, 'r', newline='') as manifest_file:
+        reader = csv.DictReader(manifest_file)
+        fieldnames = list(reader.fieldnames or [])
+        reader.fieldnames = [name.strip().lower() for name in fieldnames]
+        if KIT_COLUMN not in reader.fieldnames or 'sample_id' not in reader.fieldnames:
+            raise ValueError("Sample manifest needs Sample_ID and Kit columns")
+        group_column = next((name for name in GROUP_COLUMNS if name in reader.fieldnames), KIT_COLUMN)
+
+        for line, row in enumerate(reader, start=2):
+            sample_id, kit_name = (row.get('sample_id') or '').strip(), (row.get(KIT_COLUMN) or '').strip()
+            if not kit_name:
+                errors.append(f"Manifest line {line} ({sample_id}): no kit")
+                continue
+            kit = (manifest_path.parent / kit_name).resolve()
+            if str(kit) not in builders:
+                try:
+                    with open(kit, 'r') as kit_file:
+                        builders[str(kit)] = SampleSheetBuilder(json.load(kit_file), {})
+                except (OSError, ValueError, KeyError) as e:
+                    raise ValueError(f"Could not read kit {kit_name}: {e}")
+            try:
+                i7, i5 = builders[str(kit)].resolve(row)
+            except KeyError as e:
+                errors.append(f"Manifest line {line} ({sample_id}): {e.args[0]}")
+                continue
+            name = (row.get(group_column) or '').strip()
+            group = groups.setdefault(name, SampleGroup(name, str(kit), [], [], []))
+            if group.kit != str(kit):
+                errors.append(f"Manifest line {line}: group {name} mixes index kits")
+                continue
+            group.rows.append(row)
+            group.i7.append(i7)
+            group.i5.append(i5)
+
+    if errors:
+        raise ValueError(f"{len(errors)} manifest errors: {row_summary(errors)}")
+    return fieldnames, list(groups.values())
+
+
+def write_planned_manifest(fieldnames: List[str], groups: List[SampleGroup], placed: Dict[str, int],
+                           output_path: Path):
+    keys = [name.strip().lower() for name in fieldnames]
+    tmp_path = Path(f"{output_path}.tmp")
+    with open(tmp_path, 'w', newline='') as output_file:
+        writer = csv.writer(output_file, lineterminator='\n')
+        writer.writerow(['Lane'] + [name for name, key in zip(fieldnames, keys) if key != 'lane'])
+        for group in sorted((group for group in groups if group.name in placed), key=lambda g: placed[g.name]):
+            for row in group.rows:
+                writer.writerow([placed[group.name]] + [row.get(key, '') for key in keys if key != 'lane'])
+    os.replace(tmp_path, output_path)
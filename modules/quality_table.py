@@ -0,0 +1,76 @@
+from typing import List
+
+import pandas as pd
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QBrush, QColor
+from PySide6.QtWidgets import QAbstractItemView, QHeaderView, QTableWidget, QTableWidgetItem
+
+from modules.index_quality import QUALITY_METRICS, quality_flags
+
+QUALITY_WARNING_BRUSH = QBrush(QColor(220, 150, 0, 90))
+METRIC_HEADERS = {'gc': 'GC', 'homopolymer': 'homopolymer', 'dinucleotide_repeat': 'dinucleotide',
+                  'dark_start': 'GG start'}
+
+
+def _metric_text(metric: str, value) -> str:
+    if metric == 'gc':
+        return '' if pd.isna(value) else f"{value:.2f}"
+    if metric == 'dark_start':
+        return 'GG' if value else ''
+    return str(value) if value else ''
+
+
+class IndexQualityTable(QTableWidget):
+    def __init__(self, source: QTableWidget, parent=None):
+        super().__init__(0, 0, parent)
+        self.source = source
+        self.labels: List[str] = []
+        self.verticalHeader().hide()
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+
+        self.source.verticalScrollBar().valueChanged.connect(self.verticalScrollBar().setValue)
+        self.verticalScrollBar().valueChanged.connect(self.source.verticalScrollBar().setValue)
+
+    def set_quality(self, quality: pd.DataFrame, labels):
+        self.setUpdatesEnabled(False)
+        self.clear()
+        self.labels = list(labels)
+        self.setRowCount(len(quality))
+        self.setColumnCount(len(self.labels) * len(QUALITY_METRICS))
+        self.setHorizontalHeaderLabels([f"{label.removeprefix('index_')} {METRIC_HEADERS[metric]}"
+                                        for label in self.labels for metric in QUALITY_METRICS])
+        self._set_rows(quality, replace=False)
+        self.sync_hidden_rows()
+        self.setUpdatesEnabled(True)
+
+    def matches(self, labels) -> bool:
+        return list(labels) == self.labels and self.rowCount() == self.source.rowCount()
+
+    def update_rows(self, quality: pd.DataFrame):
+        self.setUpdatesEnabled(False)
+        self._set_rows(quality, replace=True)
+        self.setUpdatesEnabled(True)
+
+    def _set_rows(self, quality: pd.DataFrame, replace: bool):
+        rows = quality.index.tolist()
+        for n, label in enumerate(self.labels):
+            flags = quality_flags(quality, label)
+            for m, metric in enumerate(QUALITY_METRICS):
+                col = n * len(QUALITY_METRICS) + m
+                for row, value, flagged in zip(rows, quality[f"{label}_{metric}"].tolist(), flags[metric]):
+                    if not (text := _metric_text(metric, value)):
+                        if replace:
+                            self.takeItem(row, col)
+                        continue
+                    item = QTableWidgetItem(text)
+                    if flagged:
+                        item.setData(Qt.BackgroundRole, QUALITY_WARNING_BRUSH)
+                    self.setItem(row, col, item)
+
+    def sync_hidden_rows(self):
+        for row in range(self.rowCount()):
+            if self.isRowHidden(row) != self.source.isRowHidden(row):
+                self.setRowHidden(row, self.source.isRowHidden(row))
+        self.verticalScrollBar().setValue(self.source.verticalScrollBar().value())
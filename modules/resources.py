@@ -1,7 +1,9 @@
-from PySide6.QtCore import QRegularExpression
 from PySide6.QtGui import QValidator
 from PySide6.QtWidgets import (QGroupBox, QFormLayout, QLineEdit, QComboBox,
-                               QHBoxLayout, QLabel, QWidget)
+                               QHBoxLayout, QLabel, QWidget, QCheckBox)
+
+from modules.validation import (ACCEPTABLE, INTERMEDIATE, INVALID, adapter_state, override_cycles_errors,
+                                override_cycles_state)
 
 
 class ResourcesSettings(QGroupBox):
@@ -45,6 +47,9 @@ class ResourcesSettings(QGroupBox):
         layout.addRow("", override_h_widget)
         layout.addRow("override cycles pattern", override_widget)
 
+        self.mixed_lengths_checkbox = QCheckBox("pad shorter indexes with N cycles")
+        layout.addRow("mixed index lengths", self.mixed_lengths_checkbox)
+
         self.set_validators()
 
     def set_validators(self):
@@ -55,6 +60,9 @@ class ResourcesSettings(QGroupBox):
         self.widgets['override_cycles_pattern_r1'].setValidator(ReadValidator())
         self.widgets['override_cycles_pattern_r2'].setValidator(ReadValidator())
 
+    def mixed_lengths(self) -> bool:
+        return self.mixed_lengths_checkbox.isChecked()
+
     def set_layout_illumina(self, value):
         self.widgets['kit_type'].setCurrentText(value)
 
@@ -62,51 +70,34 @@ class ResourcesSettings(QGroupBox):
         data_dict = {key: widget.text() if isinstance(widget, QLineEdit) else widget.currentText()
                      for key, widget in self.widgets.items()}
 
-        for k in ["override_cycles_pattern_i1", "override_cycles_pattern_i2"]:
-            if not IndexValidator.regex.match(data_dict[k]).hasMatch():
-                raise ValueError(f"Incomplete override cycle pattern field: {k}")
-
-        for k in ["override_cycles_pattern_r1", "override_cycles_pattern_r2"]:
-            if not ReadValidator.regex.match(data_dict[k]).hasMatch():
-                raise ValueError(f"Incomplete override cycle pattern field: {k}")
+        if errors := override_cycles_errors(data_dict):
+            raise ValueError(errors[0])
 
         return data_dict
 
 
-class BaseValidator(QValidator):
-    def __init__(self, regex, parent=None):
-        super().__init__(parent)
-        self.regex = QRegularExpression(regex)
-
-    def validate(self, input_string, pos):
-        if not input_string:
-            return QValidator.Acceptable, input_string, pos
+QVALIDATOR_STATES = {
+    ACCEPTABLE: QValidator.Acceptable,
+    INTERMEDIATE: QValidator.Intermediate,
+    INVALID: QValidator.Invalid,
+}
 
-        if self.regex.match(input_string).hasMatch():
-            return QValidator.Acceptable, input_string, pos
 
-        partial_regex = QRegularExpression(self.regex.pattern().replace('+', '*') + r'([' + self.regex.pattern()[2] + r'](?:\d*|x)?)?$')
-        if partial_regex.match(input_string).hasMatch():
-            return QValidator.Intermediate, input_string, pos
+class BaseValidator(QValidator):
+    read_type = ''
 
-        return QValidator.Invalid, input_string, pos
+    def validate(self, input_string, pos):
+        return QVALIDATOR_STATES[override_cycles_state(input_string, self.read_type)], input_string, pos
 
 
 class IndexValidator(BaseValidator):
-    regex = QRegularExpression(r'^(?!.*x.*x)([IUN](?:\d+|x))+$')
-
-    def __init__(self, parent=None):
-        super().__init__(self.regex.pattern(), parent)
+    read_type = 'index'
 
 
 class ReadValidator(BaseValidator):
-    regex = QRegularExpression(r'^(?!.*x.*x)([YUN](?:\d+|x))+$')
-
-    def __init__(self, parent=None):
-        super().__init__(self.regex.pattern(), parent)
+    read_type = 'read'
 
 
 class AdapterValidator(QValidator):
     def validate(self, input_string, pos):
-        return QValidator.Acceptable if set(input_string.upper()) <= set('ACGT+') else QValidator.Invalid
-
+        return QVALIDATOR_STATES[adapter_state(input_string)]
@@ -0,0 +1,108 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from modules.validation import INDEX_LABELS, OVERRIDE_CYCLES_FIELDS, compile_override_cycles
+
+
+class RunRead(NamedTuple):
+    number: int
+    cycles: int
+    is_index: bool
+
+
+class RunInfo(NamedTuple):
+    run_id: str
+    path: Path
+    reads: Tuple[RunRead, ...]
+
+    @property
+    def structure(self) -> Tuple[Tuple[int, bool], ...]:
+        return tuple((read.cycles, read.is_index) for read in self.reads)
+
+
+def read_run_info(run_info_path: Path) -> RunInfo:
+    run_id, reads = '', []
+    for event, element in ET.iterparse(run_info_path, events=('start', 'end')):
+        if event == 'start' and element.tag == 'Run':
+            run_id = element.get('Id', '')
+        elif event == 'end' and element.tag == 'Read':
+            reads.append(RunRead(int(element.get('Number')), int(element.get('NumCycles')),
+                                 element.get('IsIndexedRead', 'N').upper() == 'Y'))
+        elif event == 'end' and element.tag == 'Reads':
+            break
+    return RunInfo(run_id, Path(run_info_path), tuple(sorted(reads)))
+
+
+def find_run_info_files(paths: Iterable[Path]) -> Iterator[Path]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(path.rglob('RunInfo.xml'))
+        else:
+            yield path
+
+
+def assign_reads(reads: Iterable[RunRead]) -> Dict[str, RunRead]:
+    reads = list(reads)
+    sequencing_reads = [read for read in reads if not read.is_index]
+    index_reads = [read for read in reads if read.is_index]
+    return {**dict(zip(['r1', 'r2'], sequencing_reads)), **dict(zip(['i1', 'i2'], index_reads))}
+
+
+def kit_index_lengths(document: Dict[str, Any]) -> Dict[str, int]:
+    lengths = {}
+    for records in document.get('indexes', {}).values():
+        for record in records:
+            for label in INDEX_LABELS:
+                if record.get(label):
+                    lengths[label] = max(lengths.get(label, 0), len(record[label]))
+    return lengths
+
+
+def run_compatibility_errors(resource: Dict[str, Any], index_lengths: Dict[str, int],
+                             reads: Iterable[RunRead]) -> List[str]:
+    assigned = assign_reads(reads)
+    index_fields = {field: label for label, field in INDEX_LABELS.items()}
+    length_groups = resource.get('override_cycles_length_groups') or {}
+    errors = []
+
+    for field, read_type in OVERRIDE_CYCLES_FIELDS.items():
+        pattern = resource.get(field) or ''
+        read = assigned.get(field[-2:])
+        label = index_fields.get(field)
+
+        if read is None:
+            if 'I' in pattern:
+                errors.append(f"{field}: run has no read for {pattern}")
+            continue
+
+        if label and read.cycles < index_lengths.get(label, 0):
+            errors.append(f"{field}: index read {read.number} has {read.cycles} cycles, "
+                          f"shorter than the {index_lengths[label]} bp {label} indexes")
+
+        for group_pattern in [pattern, *length_groups.get(field, {}).values()]:
+            try:
+                compile_override_cycles(group_pattern, read_type, read.cycles)
+            except ValueError as e:
+                errors.append(f"{field}: {e}")
+
+    return errors
+
+
+def check_runs(document: Dict[str, Any], run_info_paths: Iterable[Path]) -> Dict[str, Dict[str, Any]]:
+    resource, index_lengths = document['resource'], kit_index_lengths(document)
+    checked: Dict[Tuple[Tuple[int, bool], ...], List[str]] = {}
+    report = {}
+
+    for run_info_path in find_run_info_files(run_info_paths):
+        try:
+            run_info = read_run_info(run_info_path)
+        except (ET.ParseError, OSError, TypeError, ValueError) as e:
+            report[str(run_info_path)] = {'run_id': '', 'errors': [f"Unreadable RunInfo.xml: {e}"]}
+            continue
+
+        if run_info.structure not in checked:
+            checked[run_info.structure] = run_compatibility_errors(resource, index_lengths, run_info.reads)
+        report[str(run_info_path)] = {'run_id': run_info.run_id, 'errors': checked[run_info.structure]}
+
+    return report
@@ -0,0 +1,204 @@
+import csv
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from modules.run_info import RunRead, assign_reads
+from modules.sequences import PackedSequences, hamming_matrix, reverse_complement
+from modules.validation import (OVERRIDE_CYCLES_FIELDS, compile_override_cycles, format_override_cycles,
+                                length_override_cycles, parse_override_cycles, row_summary)
+
+READ_KEYS = ['r1', 'i1', 'i2', 'r2']
+READ_CYCLE_KEYS = {'r1': 'Read1Cycles', 'r2': 'Read2Cycles', 'i1': 'Index1Cycles', 'i2': 'Index2Cycles'}
+WELL_COLUMNS = ['well', 'index_well', 'fixed_pos']
+I7_NAME_COLUMNS = ['i7_index_id', 'index_i7_name', 'index_name']
+I5_NAME_COLUMNS = ['i5_index_id', 'index_i5_name']
+PASSTHROUGH_COLUMNS = {'sample_project': 'Sample_Project'}
+# BCL Convert allows one mismatch per index read by default, so samples need at least 3 differences
+DEFAULT_MIN_DISTANCE = 3
+DISTANCE_BLOCK_CELLS = 1 << 24
+
+
+def parse_read_cycles(text: str) -> Dict[str, int]:
+    cycles = [int(value) for value in text.split(',') if value.strip()]
+    keys = {4: READ_KEYS, 3: ['r1', 'i1', 'r2']}.get(len(cycles))
+    if keys is None:
+        raise ValueError(f"Expected r1,i1,i2,r2 or r1,i1,r2 cycles, got: {text}")
+    return dict(zip(keys, cycles))
+
+
+def run_read_cycles(reads: Iterable[RunRead]) -> Dict[str, int]:
+    return {key: read.cycles for key, read in assign_reads(reads).items()}
+
+
+@lru_cache(maxsize=256)
+def fit_override_cycles(pattern: str, read_type: str, cycles: int) -> str:
+    if not pattern:
+        return f"N{cycles}"
+    segments = parse_override_cycles(pattern, read_type)
+    fixed_cycles = sum(segment.length or 0 for segment in segments)
+    if all(segment.length is not None for segment in segments) and fixed_cycles < cycles:
+        pattern = f"{pattern}N{cycles - fixed_cycles}"
+    return format_override_cycles(compile_override_cycles(pattern, read_type, cycles))
+
+
+def close_index_pairs(keys: List[Tuple[str, ...]], min_distance: int) -> Iterator[Tuple[int, int, int]]:
+    n_keys, n_reads = len(keys), max((len(key) for key in keys), default=0)
+    matrices = [PackedSequences([key[read] if read < len(key) else '' for key in keys]).code_matrix()
+                for read in range(n_reads)]
+    block = max(1, DISTANCE_BLOCK_CELLS // max(1, n_keys * sum(matrix.shape[1] for matrix in matrices)))
+    for start in range(0, n_keys, block):
+        distance = np.zeros((min(block, n_keys - start), n_keys - start), dtype=np.int16)
+        for matrix in matrices:
+            np.maximum(distance, hamming_matrix(matrix[start:start + block], matrix[start:]), out=distance)
+        rows, cols = np.nonzero((distance < min_distance) & np.triu(np.ones(distance.shape, dtype=bool), k=1))
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            yield start + row, start + col, int(distance[row, col])
+
+
+class SampleSheetBuilder:
+    def __init__(self, document: Dict[str, Any], read_cycles: Dict[str, int], i5_reverse_complement: bool = False):
+        self.resource = document['resource']
+        self.index_kit = document['index_kit']
+        self.read_cycles = read_cycles
+        self.i5_reverse_complement = i5_reverse_complement
+        self.length_groups = self.resource.get('override_cycles_length_groups') or {}
+
+        self.by_well: Dict[str, Tuple[str, str | None]] = {}
+        self.i7_by_name: Dict[str, str] = {}
+        self.i5_by_name: Dict[str, str] = {}
+        for records in document['indexes'].values():
+            for record in records:
+                if record.get('index_i7_name') and record.get('index_i7'):
+                    self.i7_by_name.setdefault(str(record['index_i7_name']), str(record['index_i7']).upper())
+                if record.get('index_i5_name') and record.get('index_i5'):
+                    self.i5_by_name.setdefault(str(record['index_i5_name']), str(record['index_i5']).upper())
+                if record.get('fixed_pos'):
+                    i5 = record.get('index_i5')
+                    self.by_well[str(record['fixed_pos'])] = (str(record['index_i7']).upper(),
+                                                              str(i5).upper() if i5 else None)
+        self._override_cycles: Dict[Tuple[int, int], str] = {}
+
+    def header_lines(self, run_name: str = '') -> Iterator[List[str]]:
+        yield ['[Header]']
+        yield ['FileFormatVersion', '2']
+        if run_name:
+            yield ['RunName', run_name]
+        yield []
+        yield ['[Reads]']
+        for key in READ_KEYS:
+            if key in self.read_cycles:
+                yield [READ_CYCLE_KEYS[key], str(self.read_cycles[key])]
+        yield []
+        yield ['[BCLConvert_Settings]']
+        for setting, field in [('AdapterRead1', 'adapter_read1'), ('AdapterRead2', 'adapter_read2')]:
+            if self.resource.get(field):
+                yield [setting, self.resource[field]]
+        yield []
+        yield ['[BCLConvert_Data]']
+
+    def override_cycles(self, i7: str, i5: str | None) -> str:
+        key = (len(i7), len(i5) if i5 else 0)
+        if key not in self._override_cycles:
+            lengths = {'override_cycles_pattern_i1': key[0], 'override_cycles_pattern_i2': key[1]}
+            segments = []
+            for field, read_type in OVERRIDE_CYCLES_FIELDS.items():
+                read_key = field[-2:]
+                if read_key not in self.read_cycles:
+                    continue
+                pattern = self.resource.get(field) or ''
+                if field in lengths and lengths[field] and field in self.length_groups:
+                    pattern = length_override_cycles(lengths[field], self.read_cycles[read_key])
+                elif field in lengths and not lengths[field]:
+                    pattern = ''
+                segments.append(fit_override_cycles(pattern, read_type, self.read_cycles[read_key]))
+            self._override_cycles[key] = ';'.join(segments)
+        return self._override_cycles[key]
+
+    @staticmethod
+    def _column(row: Dict[str, str], names: List[str]) -> str:
+        return next((row[name].strip() for name in names if row.get(name)), '')
+
+    def resolve(self, row: Dict[str, str]) -> Tuple[str, str | None]:
+        if well := self._column(row, WELL_COLUMNS):
+            if well not in self.by_well:
+                raise KeyError(f"unknown well {well}")
+            return self.by_well[well]
+
+        i7_name, i5_name = self._column(row, I7_NAME_COLUMNS), self._column(row, I5_NAME_COLUMNS)
+        if not i7_name:
+            raise KeyError("no well or index name")
+        if i7_name not in self.i7_by_name:
+            raise KeyError(f"unknown i7 index {i7_name}")
+        if i5_name and i5_name not in self.i5_by_name:
+            raise KeyError(f"unknown i5 index {i5_name}")
+        return self.i7_by_name[i7_name], self.i5_by_name.get(i5_name) if i5_name else None
+
+
+def write_bclconvert_sample_sheet(document: Dict[str, Any], manifest_path: Path, output_path: Path,
+                                  read_cycles: Dict[str, int], run_name: str = '',
+                                  i5_reverse_complement: bool = False,
+                                  min_distance: int = DEFAULT_MIN_DISTANCE) -> Dict[str, Any]:
+    builder = SampleSheetBuilder(document, read_cycles, i5_reverse_complement)
+    errors: List[str] = []
+    lanes: Dict[str, Dict[Tuple[str, ...], str]] = {}
+    lane_sample_ids: Dict[str, set] = {}
+    samples = 0
+
+    tmp_path = Path(f"{output_path}.tmp")
+    try:
+        with open(manifest_path, 'r', newline='') as manifest_file, open(tmp_path, 'w', newline='') as sheet_file:
+            reader = csv.DictReader(manifest_file)
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            if 'sample_id' not in reader.fieldnames:
+                raise ValueError("Sample manifest needs a Sample_ID column")
+            passthrough = [name for name in PASSTHROUGH_COLUMNS if name in reader.fieldnames]
+            has_lane = 'lane' in reader.fieldnames
+            has_i5 = bool(builder.i5_by_name) and 'i2' in read_cycles
+
+            writer = csv.writer(sheet_file, lineterminator='\n')
+            writer.writerows(builder.header_lines(run_name))
+            writer.writerow((['Lane'] if has_lane else []) + ['Sample_ID', 'Index'] + (['Index2'] if has_i5 else [])
+                            + ['OverrideCycles'] + [PASSTHROUGH_COLUMNS[name] for name in passthrough])
+
+            for line, row in enumerate(reader, start=2):
+                sample_id, lane = (row.get('sample_id') or '').strip(), (row.get('lane') or '').strip()
+                if not sample_id:
+                    errors.append(f"Manifest line {line}: no Sample_ID")
+                    continue
+                try:
+                    i7, i5 = builder.resolve(row)
+                except KeyError as e:
+                    errors.append(f"Manifest line {line} ({sample_id}): {e.args[0]}")
+                    continue
+                samples += 1
+
+                if sample_id in lane_sample_ids.setdefault(lane, set()):
+                    errors.append(f"Sample_ID {sample_id} is used more than once in lane {lane or 'all'}")
+                lane_sample_ids[lane].add(sample_id)
+
+                key = (i7, i5) if has_i5 and i5 else (i7,)
+                if (other := lanes.setdefault(lane, {}).get(key)) is not None:
+                    errors.append(f"Lane {lane or 'all'}: {sample_id} and {other} share index {'+'.join(key)}")
+                lanes[lane].setdefault(key, sample_id)
+
+                index2 = reverse_complement(i5) if i5 and i5_reverse_complement else i5 or ''
+                writer.writerow(([lane] if has_lane else []) + [sample_id, i7] + ([index2] if has_i5 else []) +
+                                [builder.override_cycles(i7, i5 if has_i5 else None)] +
+                                [row.get(name) or '' for name in passthrough])
+
+        for lane, keys in lanes.items():
+            sample_ids = list(keys.values())
+            for a, b, distance in close_index_pairs(list(keys), min_distance):
+                errors.append(f"Lane {lane or 'all'}: {sample_ids[a]} and {sample_ids[b]} indexes differ at only "
+                              f"{distance} positions (minimum {min_distance})")
+        if errors:
+            raise ValueError(f"{len(errors)} sample sheet errors: {row_summary(errors)}")
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, output_path)
+    return {'output': str(output_path), 'samples': samples, 'lanes': sorted(lane for lane in lanes if lane)}
@@ -0,0 +1,291 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+from modules.export import TIMESTAMP_FORMAT, table_kit_data, user_info, write_json_file
+from modules.kit_type import KitTypeFields, load_kit_type_fields
+from modules.validation import INDEX_SEQUENCE_REGEX, parse_override_cycles
+
+SECTION_REGEX = re.compile(r'^\[(\w+)\]')
+DATA_SECTIONS = {'data': 1, 'bclconvert_data': 2}
+SETTINGS_SECTIONS = {'settings', 'bclconvert_settings'}
+ADAPTER_SETTINGS = {'adapter': 'adapter_read1', 'adapterread1': 'adapter_read1', 'adapterread2': 'adapter_read2'}
+OVERRIDE_CYCLES_KEYS = {4: ['r1', 'i1', 'i2', 'r2'], 3: ['r1', 'i1', 'r2']}
+REGISTRY_NAME = 'harvest_registry.json'
+
+_worker_kit_type_fields: Dict[str, KitTypeFields] = {}
+
+
+def is_sample_sheet(file_path: Path) -> bool:
+    with open(file_path, 'r', encoding='utf-8-sig') as sheet_file:
+        for line in sheet_file:
+            if line.strip(', \r\n'):
+                return bool(SECTION_REGEX.match(line.strip()))
+    return False
+
+
+def kit_override_cycles(value: str) -> Dict[str, str]:
+    parts = [part.strip() for part in value.split(';')]
+    if len(parts) not in OVERRIDE_CYCLES_KEYS:
+        return {}
+    patterns = {}
+    for key, part in zip(OVERRIDE_CYCLES_KEYS[len(parts)], parts):
+        read_type = 'read' if key.startswith('r') else 'index'
+        try:
+            segments = list(parse_override_cycles(part, read_type))
+        except ValueError:
+            return {}
+        if read_type == 'index':
+            while len(segments) > 1 and segments[-1].kind == 'N':
+                segments.pop()
+        elif segments[-1].kind == 'Y':
+            segments[-1] = segments[-1]._replace(length=None)
+        patterns[f"override_cycles_pattern_{key}"] = ''.join(str(segment) for segment in segments)
+    return patterns
+
+
+class ImportedSampleSheet:
+    def __init__(self, file_path: Path):
+        self.file_path = Path(file_path)
+        self.version: int | None = None
+        self.header: Dict[str, str] = {}
+        self.settings: Dict[str, str] = {}
+        self.reads: List[int] = []
+        self.pairs: Dict[Tuple[str, str | None], Dict[str, str | None]] = {}
+        self.override_cycles: Counter = Counter()
+        self.samples = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.samples - len(self.pairs)
+
+    @property
+    def has_i5(self) -> bool:
+        return any(i5 for _, i5 in self.pairs)
+
+    @property
+    def has_wells(self) -> bool:
+        wells = [entry['well'] for entry in self.pairs.values()]
+        return all(wells) and len(set(wells)) == len(wells)
+
+    @property
+    def is_combinatorial(self) -> bool:
+        i7, i5 = {i7 for i7, _ in self.pairs}, {i5 for _, i5 in self.pairs}
+        return len(self.pairs) == len(i7) * len(i5)
+
+    @property
+    def is_fixed(self) -> bool:
+        return self.has_wells or not self.is_combinatorial
+
+    @property
+    def kit_type(self) -> str:
+        layout = 'dual' if self.has_i5 else 'single'
+        return f"fixed_{layout}_index" if self.is_fixed else f"standard_{layout}_index"
+
+    def add_row(self, i7: str, i5: str | None, i7_name: str, i5_name: str, well: str, override_cycles: str):
+        self.samples += 1
+        if override_cycles:
+            self.override_cycles[override_cycles] += 1
+        if (i7, i5) not in self.pairs:
+            self.pairs[(i7, i5)] = {'i7_name': i7_name or i7, 'i5_name': (i5_name or i5) if i5 else None,
+                                    'well': well}
+
+    @property
+    def position_source(self) -> str | None:
+        if self.has_wells:
+            return 'Sample_Well'
+        return 'pair order' if self.is_fixed else None
+
+    def positions(self) -> List[str]:
+        if self.has_wells:
+            return [entry['well'] for entry in self.pairs.values()]
+        digits = len(str(len(self.pairs)))
+        return [f"P{n:0{digits}d}" for n in range(1, len(self.pairs) + 1)]
+
+    @property
+    def indices_df(self) -> pd.DataFrame:
+        if self.is_fixed:
+            rows = [{'fixed_pos': position, 'index_i7_name': entry['i7_name'], 'index_i7': i7,
+                     **({'index_i5_name': entry['i5_name'], 'index_i5': i5} if self.has_i5 else {})}
+                    for position, ((i7, i5), entry) in zip(self.positions(), self.pairs.items())]
+            return pd.DataFrame(rows)
+
+        i7, i5 = {}, {}
+        for (i7_sequence, i5_sequence), entry in self.pairs.items():
+            i7.setdefault(i7_sequence, entry['i7_name'])
+            if i5_sequence:
+                i5.setdefault(i5_sequence, entry['i5_name'])
+        df = pd.DataFrame({'index_i7_name': list(i7.values()), 'index_i7': list(i7)})
+        if i5:
+            df = pd.concat([df, pd.DataFrame({'index_i5_name': list(i5.values()), 'index_i5': list(i5)})], axis=1)
+        return df
+
+    def resource(self) -> Dict[str, str]:
+        resource = {field: self.settings[key] for key, field in ADAPTER_SETTINGS.items() if self.settings.get(key)}
+        resource['kit_type'] = self.kit_type
+        override_cycles = self.settings.get('overridecycles')
+        if self.override_cycles:
+            override_cycles = self.override_cycles.most_common(1)[0][0]
+        if override_cycles:
+            resource.update(kit_override_cycles(override_cycles))
+        return resource
+
+    def content_key(self) -> str:
+        pairs = [[i7, i5, entry['i7_name'], entry['i5_name'], entry['well']] for (i7, i5), entry in self.pairs.items()]
+        content = json.dumps([self.resource(), pairs], separators=(',', ':'))
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def index_kit(self) -> Dict[str, str]:
+        name = re.sub(r'\W+', '_', self.file_path.stem).strip('_') or 'sample_sheet'
+        return {'name': name, 'display_name': self.file_path.stem, 'version': '1',
+                'description': f"Imported from {self.file_path.name}"}
+
+
+def _column(row: List[str], columns: Dict[str, int], name: str) -> str:
+    col = columns.get(name)
+    return row[col].strip() if col is not None and col < len(row) else ''
+
+
+def read_sample_sheet(file_path: Path) -> ImportedSampleSheet:
+    sheet = ImportedSampleSheet(file_path)
+    section, columns = None, None
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as sheet_file:
+        for row in csv.reader(sheet_file):
+            if not any(cell.strip() for cell in row):
+                continue
+            if match := SECTION_REGEX.match(row[0].strip()):
+                section, columns = match.group(1).lower(), None
+                sheet.version = DATA_SECTIONS.get(section, sheet.version)
+                continue
+
+            key, value = row[0].strip(), (row[1].strip() if len(row) > 1 else '')
+            if section == 'header':
+                sheet.header[key] = value
+            elif section in SETTINGS_SECTIONS:
+                sheet.settings[key.lower()] = value
+            elif section == 'reads':
+                if key.isdigit():
+                    sheet.reads.append(int(key))
+                elif value.isdigit():
+                    sheet.header[key] = value
+            elif section in DATA_SECTIONS:
+                if columns is None:
+                    columns = {name.strip().lower(): col for col, name in enumerate(row)}
+                    if 'index' not in columns:
+                        raise ValueError(f"No index column in the [{section}] section")
+                    continue
+                i7, i5 = _column(row, columns, 'index').upper(), _column(row, columns, 'index2').upper()
+                if not INDEX_SEQUENCE_REGEX.match(i7) or (i5 and not INDEX_SEQUENCE_REGEX.match(i5)):
+                    continue
+                sheet.add_row(i7, i5 or None, _column(row, columns, 'i7_index_id'),
+                              _column(row, columns, 'i5_index_id'), _column(row, columns, 'sample_well'),
+                              _column(row, columns, 'overridecycles'))
+
+    if sheet.version is None:
+        raise ValueError("No [Data] or [BCLConvert_Data] section")
+    if not sheet.pairs:
+        raise ValueError("No index sequences in the sample sheet")
+    return sheet
+
+
+def sample_sheet_kit_data(sheet: ImportedSampleSheet, kit_type_fields: Dict[str, KitTypeFields]) -> Dict[str, Any]:
+    return table_kit_data(sheet.indices_df, kit_type_fields, sheet.kit_type, sheet.index_kit(), sheet.resource(),
+                          user_info(sheet.file_path))
+
+
+def _init_worker(kit_type_fields_path: Path):
+    global _worker_kit_type_fields
+    _worker_kit_type_fields = load_kit_type_fields(kit_type_fields_path)
+
+
+def _read_job(file_path: Path) -> Dict[str, Any]:
+    try:
+        sheet = read_sample_sheet(file_path)
+    except (OSError, UnicodeDecodeError, csv.Error, ValueError) as e:
+        return {'file': str(file_path), 'error': f"{type(e).__name__}: {e}"}
+    return {'file': str(file_path), 'error': None, 'key': sheet.content_key(), 'sheet': sheet}
+
+
+def _export_job(sheet: ImportedSampleSheet) -> Dict[str, Any]:
+    try:
+        return {'document': sample_sheet_kit_data(sheet, _worker_kit_type_fields), 'error': None}
+    except (KeyError, ValueError) as e:
+        return {'document': None, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _unique_name(name: str, used_names: set) -> str:
+    candidate, n = name, 1
+    while candidate in used_names:
+        candidate, n = f"{name}_{n}", n + 1
+    used_names.add(candidate)
+    return candidate
+
+
+def harvest_sample_sheets(file_paths: Iterable[Path], output_dir: Path, kit_type_fields_path: Path,
+                          max_workers: int | None = None) -> Dict[str, Any]:
+    start = time.perf_counter()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    file_paths = list(file_paths)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(file_paths)))
+
+    registry_path = output_dir / REGISTRY_NAME
+    kits: Dict[str, Dict[str, Any]] = {}
+    if registry_path.exists():
+        with open(registry_path, 'r') as registry_file:
+            kits = json.load(registry_file).get('kits', {})
+    errors: Dict[str, str] = {}
+    used_names = {path.stem for path in output_dir.glob('*.json')}
+
+    if file_paths:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(kit_type_fields_path,)) as executor:
+            new_sheets: Dict[str, ImportedSampleSheet] = {}
+            sources: Dict[str, List[str]] = {}
+            for result in executor.map(_read_job, file_paths, chunksize=32):
+                if result['error']:
+                    errors[result['file']] = result['error']
+                    continue
+                if result['key'] not in kits:
+                    new_sheets.setdefault(result['key'], result['sheet'])
+                sources.setdefault(result['key'], []).append(result['file'])
+
+            keys = list(new_sheets)
+            for key, result in zip(keys, executor.map(_export_job, new_sheets.values(), chunksize=8)):
+                if result['error']:
+                    for file in sources.pop(key):
+                        errors[file] = result['error']
+                    continue
+                document = result['document']
+                name = _unique_name(document['index_kit']['name'], used_names)
+                write_json_file(output_dir / f"{name}.json", document)
+                kits[key] = {'kit': f"{name}.json", 'fingerprint': document['fingerprint'],
+                             'kit_type': document['resource']['kit_type'], 'pairs': len(new_sheets[key].pairs),
+                             'positions': new_sheets[key].position_source, 'sources': []}
+
+        for key, files in sources.items():
+            kits[key]['sources'] = sorted(set(kits[key]['sources']) | set(files))
+
+    registry = {
+        'harvested': datetime.now().strftime(TIMESTAMP_FORMAT),
+        'sheets': len(file_paths),
+        'kits': kits,
+        'errors': errors,
+        'workers': max_workers,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    tmp_path = registry_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as registry_file:
+        json.dump(registry, registry_file, indent=4)
+    os.replace(tmp_path, registry_path)
+    return registry
@@ -0,0 +1,54 @@
+from PySide6.QtCore import QTimer, Signal
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QLineEdit, QComboBox, QSpinBox, QLabel
+
+
+class IndexSearchBar(QWidget):
+    search_changed = Signal(str, str, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._setup_ui()
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(120)
+        self._debounce.timeout.connect(self._emit_search)
+
+        self.widgets['query'].textChanged.connect(self._debounce.start)
+        self.widgets['mode'].currentTextChanged.connect(self._on_mode_changed)
+        self.widgets['mismatches'].valueChanged.connect(self._debounce.start)
+
+    def _setup_ui(self):
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.widgets = {
+            'query': QLineEdit(),
+            'mode': QComboBox(),
+            'mismatches': QSpinBox(),
+        }
+        self.widgets['query'].setPlaceholderText("Search index names and sequences")
+        self.widgets['query'].setClearButtonEnabled(True)
+        self.widgets['mode'].addItems(['contains', 'starts with', 'mismatches'])
+        self.widgets['mismatches'].setRange(0, 3)
+        self.widgets['mismatches'].setPrefix("k = ")
+        self.widgets['mismatches'].setEnabled(False)
+        self.match_label = QLabel()
+
+        layout.addWidget(QLabel("search"))
+        for widget in self.widgets.values():
+            layout.addWidget(widget)
+        layout.addWidget(self.match_label)
+
+    def _on_mode_changed(self, mode: str):
+        self.widgets['mismatches'].setEnabled(mode == 'mismatches')
+        self._debounce.start()
+
+    def _emit_search(self):
+        self.search_changed.emit(*self.search())
+
+    def search(self) -> tuple:
+        return (self.widgets['query'].text().strip(), self.widgets['mode'].currentText(),
+                self.widgets['mismatches'].value())
+
+    def set_match_count(self, matches: int, rows: int):
+        self.match_label.setText(f"{matches} / {rows} rows" if self.search()[0] else "")
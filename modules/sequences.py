@@ -0,0 +1,86 @@
+from typing import Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+BASES = b'ACGT'
+INVALID_CODE = 255
+
+_BASE_CODES = np.full(256, INVALID_CODE, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    _BASE_CODES[_base] = _code
+    _BASE_CODES[ord(chr(_base).lower())] = _code
+_CODE_BASES = np.frombuffer(BASES, dtype=np.uint8)
+COMPLEMENT = str.maketrans('ACGTacgt', 'TGCAtgca')
+
+
+def reverse_complement(sequence: str) -> str:
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+def encode_bases(sequence: str) -> np.ndarray:
+    return _BASE_CODES[np.frombuffer(sequence.encode('ascii'), dtype=np.uint8)]
+
+
+def hamming_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a, b = a[:, None, :], b[None, :, :]
+    return ((a != b) & (a != INVALID_CODE) & (b != INVALID_CODE)).sum(axis=2, dtype=np.int16)
+
+
+class PackedSequences:
+    __slots__ = ('_packed', '_offsets')
+
+    def __init__(self, sequences: Iterable[str]):
+        sequences = ['' if pd.isna(seq) else str(seq) for seq in sequences]
+        lengths = np.fromiter((len(seq) for seq in sequences), dtype=np.int32, count=len(sequences))
+
+        self._offsets = np.zeros(len(sequences) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=self._offsets[1:])
+
+        codes = encode_bases(''.join(sequences))
+        if (codes == INVALID_CODE).any():
+            raise ValueError("Packed sequences may only contain A, C, G and T")
+
+        quads = np.zeros(-(-codes.size // 4) * 4, dtype=np.uint8)
+        quads[:codes.size] = codes
+        quads = quads.reshape(-1, 4)
+        self._packed = (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+
+    def __len__(self) -> int:
+        return self._offsets.size - 1
+
+    def __getitem__(self, row: int) -> str:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return _CODE_BASES[self.codes()[self._offsets[row]:self._offsets[row + 1]]].tobytes().decode('ascii')
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_list())
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self._offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return self._packed.nbytes + self._offsets.nbytes
+
+    def codes(self) -> np.ndarray:
+        shifts = np.array([6, 4, 2, 0], dtype=np.uint8)
+        return ((self._packed[:, None] >> shifts) & 3).ravel()[:self._offsets[-1]]
+
+    def code_matrix(self, fill: int = INVALID_CODE) -> np.ndarray:
+        lengths = self.lengths
+        matrix = np.full((len(self), lengths.max(initial=0)), fill, dtype=np.uint8)
+        matrix[np.arange(matrix.shape[1]) < lengths[:, None]] = self.codes()
+        return matrix
+
+    def padded_code_matrix(self, width: int) -> np.ndarray:
+        matrix = self.code_matrix()
+        return np.pad(matrix, ((0, 0), (0, width - matrix.shape[1])), constant_values=INVALID_CODE)
+
+    def to_list(self) -> List[str]:
+        text = _CODE_BASES[self.codes()].tobytes().decode('ascii')
+        return [text[start:end] for start, end in zip(self._offsets[:-1], self._offsets[1:])]
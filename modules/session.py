@@ -0,0 +1,249 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pandas as pd
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+from PySide6.QtWidgets import QCheckBox, QComboBox, QLineEdit, QTableWidgetItem, QWidget
+
+from modules.session_journal import SessionJournal
+
+SESSION_DIR = Path.home() / '.index_tool' / 'session'
+SESSION_TABS_DIR = SESSION_DIR / 'tabs'
+FORM_RECORD_INTERVAL = 500
+
+
+def tab_session_dir(tab_id: int) -> Path:
+    return SESSION_DIR if tab_id == 0 else SESSION_TABS_DIR / str(tab_id)
+
+
+def saved_tab_ids() -> List[int]:
+    if not SESSION_TABS_DIR.is_dir():
+        return []
+    return sorted(int(path.name) for path in SESSION_TABS_DIR.iterdir() if path.is_dir() and path.name.isdigit())
+
+
+class SessionRecorder(QObject):
+    notify_signal = Signal(str, bool)
+
+    def __init__(self, index_table_container, session_dir: Path = SESSION_DIR):
+        super().__init__(index_table_container)
+        self.container = index_table_container
+        self.tablewidget = index_table_container.tablewidget
+        self.header = self.tablewidget.horizontalHeader()
+        self.journal = SessionJournal(session_dir)
+        self.form_widgets = self._form_widgets()
+        self._applying = False
+        self._pending_form: Dict[str, Any] = {}
+
+        self._table_timer = QTimer(self)
+        self._table_timer.setSingleShot(True)
+        self._table_timer.setInterval(0)
+        self._form_timer = QTimer(self)
+        self._form_timer.setSingleShot(True)
+        self._form_timer.setInterval(FORM_RECORD_INTERVAL)
+        self._connect_signals()
+
+    def _form_widgets(self) -> Dict[str, QWidget]:
+        widgets = {f"user.{key}": self.container.user_settings.widgets[key] for key in ['user', 'file_path']}
+        for section, settings in [('index_kit', self.container.index_kit_settings),
+                                  ('resource', self.container.resources_settings)]:
+            widgets.update({f"{section}.{key}": widget for key, widget in settings.widgets.items()})
+        widgets['resource.mixed_lengths'] = self.container.resources_settings.mixed_lengths_checkbox
+        return widgets
+
+    def _connect_signals(self):
+        self._table_timer.timeout.connect(self.record_table)
+        self._form_timer.timeout.connect(self.flush_form)
+
+        model = self.tablewidget.model()
+        model.dataChanged.connect(self._record_cells)
+        for signal in [model.rowsInserted, model.rowsRemoved, model.columnsInserted, model.columnsRemoved,
+                       model.layoutChanged, self.tablewidget.cells_changed]:
+            signal.connect(self._table_timer.start)
+        model.headerDataChanged.connect(self._record_header)
+        self.tablewidget.columns_hidden.connect(self._record_hidden)
+
+        for field, widget in self.form_widgets.items():
+            if isinstance(widget, QLineEdit):
+                widget.textChanged.connect(lambda value, field=field: self._record_form(field, value))
+            elif isinstance(widget, QComboBox):
+                widget.currentTextChanged.connect(lambda value, field=field: self._record_form(field, value))
+            elif isinstance(widget, QCheckBox):
+                widget.toggled.connect(lambda value, field=field: self._record_form(field, value))
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        return self.journal.session.state
+
+    def _labels(self) -> List[str]:
+        return [str(label) for label in self.header.header_labels()]
+
+    def _original_labels(self) -> Dict[str, str]:
+        return {str(col): label for col, label in self.header.original_labels.items()}
+
+    def _hidden(self) -> List[int]:
+        return [col for col in range(self.tablewidget.columnCount()) if self.tablewidget.isColumnHidden(col)]
+
+    def _cells(self) -> List[List[str | None]]:
+        columns = self.tablewidget.column_values()
+        return [list(row) for row in zip(*columns.values())] if columns else []
+
+    def record_table(self):
+        self._table_timer.stop()
+        if self._applying:
+            return
+        self.flush_form()
+        labels, cells = self._labels(), self._cells()
+        if labels == self.state['labels'] and cells == self.state['cells']:
+            return
+        self.journal.record_table(self.container.user_settings.get_filepath(), labels,
+                                  self.header.original_labels, self._hidden(), cells)
+
+    def _record_cells(self, top_left, bottom_right, roles=()):
+        if self._applying or self._table_timer.isActive() or (roles and not {Qt.DisplayRole, Qt.EditRole} & set(roles)):
+            return
+        self.flush_form()
+        cells = self.state['cells']
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            for col in range(top_left.column(), bottom_right.column() + 1):
+                item = self.tablewidget.item(row, col)
+                value = item.text() if item else None
+                if row >= len(cells) or col >= len(cells[row]) or cells[row][col] != value:
+                    self.journal.record({'op': 'cell', 'row': row, 'col': col, 'value': value})
+
+    def _record_header(self, orientation, first: int, last: int):
+        if self._applying or orientation != Qt.Horizontal or self._table_timer.isActive():
+            return
+        self.flush_form()
+        labels, original_labels = self._labels(), self._original_labels()
+        if labels != self.state['labels'] or original_labels != self.state['original_labels']:
+            self.journal.record({'op': 'header', 'labels': labels, 'original_labels': original_labels})
+
+    def _record_hidden(self):
+        if not self._applying and (hidden := self._hidden()) != self.state['hidden']:
+            self.flush_form()
+            self.journal.record({'op': 'hidden', 'hidden': hidden})
+
+    def _record_form(self, field: str, value):
+        if not self._applying:
+            self._pending_form[field] = value
+            self._form_timer.start()
+
+    def flush_form(self):
+        self._form_timer.stop()
+        pending, self._pending_form = self._pending_form, {}
+        self.journal.record_many([{'op': 'form', 'field': field, 'value': value} for field, value in pending.items()
+                                  if self.state['form'].get(field) != value])
+
+    def _apply_table(self, change: Dict[str, Any]):
+        df = pd.DataFrame(change['cells'], columns=change['labels']) if change['labels'] else pd.DataFrame()
+        self.tablewidget.set_dataframe(df)
+        self._apply_header(change)
+        self._apply_hidden(change)
+
+    def _apply_header(self, change: Dict[str, Any]):
+        model = self.tablewidget.model()
+        for col, label in enumerate(change['labels']):
+            model.setHeaderData(col, Qt.Horizontal, label)
+        self.header.original_labels = {int(col): label for col, label in change['original_labels'].items()}
+
+    def _apply_hidden(self, change: Dict[str, Any]):
+        for col in range(self.tablewidget.columnCount()):
+            self.tablewidget.setColumnHidden(col, col in change['hidden'])
+
+    def _apply_cell(self, change: Dict[str, Any]):
+        row, col, value = change['row'], change['col'], change['value']
+        if item := self.tablewidget.item(row, col):
+            item.setText(value or '')
+        elif value is not None:
+            self.tablewidget.setItem(row, col, QTableWidgetItem(value))
+
+    def _apply_cells(self, change: Dict[str, Any]):
+        self.tablewidget.setRowCount(change['rows'])
+        self.tablewidget.setColumnCount(len(change['labels']))
+        model = self.tablewidget.model()
+        for col, label in enumerate(change['labels']):
+            if model.headerData(col, Qt.Horizontal) != label:
+                model.setHeaderData(col, Qt.Horizontal, label)
+        signals_blocked = model.blockSignals(True)
+        try:
+            for row, col, value in change['changes']:
+                self._apply_cell({'row': row, 'col': col, 'value': value})
+        finally:
+            model.blockSignals(signals_blocked)
+            self.tablewidget.viewport().update()
+        self.tablewidget.cells_changed.emit()
+
+    def _apply_form(self, field: str, value):
+        widget = self.form_widgets.get(field)
+        if isinstance(widget, QLineEdit):
+            widget.setText(value or '')
+        elif isinstance(widget, QComboBox) and value:
+            widget.setCurrentText(value)
+        elif isinstance(widget, QCheckBox):
+            widget.setChecked(bool(value))
+
+    def apply_change(self, change: Dict[str, Any]):
+        self._applying = True
+        try:
+            if change['op'] == 'table':
+                self._apply_table(change)
+            elif change['op'] == 'cells':
+                self._apply_cells(change)
+            elif change['op'] == 'permute':
+                self._apply_table({'op': 'table', **self.state})
+            elif change['op'] == 'cell':
+                self._apply_cell(change)
+            elif change['op'] == 'header':
+                self._apply_header(change)
+            elif change['op'] == 'hidden':
+                self._apply_hidden(change)
+            elif change['op'] == 'form':
+                self._apply_form(change['field'], change['value'])
+        finally:
+            self._applying = False
+
+    def has_saved_session(self) -> bool:
+        if not self.journal.has_session():
+            return False
+        try:
+            state = self.journal.restore().state
+        except (OSError, ValueError, KeyError) as e:
+            self.notify_signal.emit(f"Could not restore previous session: {e}", True)
+            self.journal.clear()
+            return False
+        return bool(state['labels'] or state['form'])
+
+    def restore(self):
+        state = self.state
+        for field, value in state['form'].items():
+            self.apply_change({'op': 'form', 'field': field, 'value': value})
+        self.apply_change({'op': 'table', **state})
+
+    def discard(self):
+        self._pending_form.clear()
+        self.journal.clear()
+
+    def undo(self):
+        self.flush_form()
+        if change := self.journal.undo():
+            self.apply_change(change)
+        else:
+            self.notify_signal.emit("Nothing to undo", False)
+
+    def redo(self):
+        self.flush_form()
+        if change := self.journal.redo():
+            self.apply_change(change)
+        else:
+            self.notify_signal.emit("Nothing to redo", False)
+
+    def close(self):
+        self.flush_form()
+        self.journal.close()
+
+    def remove(self):
+        self._table_timer.stop()
+        self._form_timer.stop()
+        self._pending_form.clear()
+        self.journal.remove()
@@ -0,0 +1,272 @@
+import copy
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+from modules.file_hash import file_sha256
+
+UNDO_DEPTH = 200
+COMPACT_EVERY = 500
+TABLE_KEYS = ['file', 'labels', 'original_labels', 'hidden', 'cells']
+
+
+def empty_state() -> Dict[str, Any]:
+    return {'file': None, 'labels': [], 'original_labels': {}, 'hidden': [], 'cells': [], 'form': {}}
+
+
+def row_permutation(old: List[List[str | None]], new: List[List[str | None]]) -> List[int] | None:
+    if len(old) != len(new):
+        return None
+    rows: Dict[tuple, List[int]] = {}
+    for row, values in reversed(list(enumerate(old))):
+        rows.setdefault(tuple(values), []).append(row)
+    order = []
+    for values in new:
+        if not (candidates := rows.get(tuple(values))):
+            return None
+        order.append(candidates.pop())
+    return order
+
+
+def cell_changes(old_labels: List[str], old: List[List[str | None]], labels: List[str],
+                 cells: List[List[str | None]]) -> Dict[str, Any]:
+    n_cols = len(old_labels)
+    changes = [[row, col, value] for row, values in enumerate(cells) for col, value in enumerate(values)
+               if value != (old[row][col] if row < len(old) and col < n_cols else None)]
+    return {'op': 'cells', 'rows': len(cells), 'labels': labels, 'changes': changes}
+
+
+class SessionState:
+    def __init__(self, state: Dict[str, Any] | None = None, undo: List[Dict[str, Any]] | None = None,
+                 redo: List[Dict[str, Any]] | None = None):
+        self.state = state or empty_state()
+        self.undo_stack = undo or []
+        self.redo_stack = redo or []
+
+    def _apply(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        state, kind = self.state, op['op']
+        if kind == 'table':
+            inverse = {'op': 'table', **{key: state[key] for key in TABLE_KEYS}}
+            state.update({key: op[key] for key in TABLE_KEYS})
+            state['cells'] = [list(row) for row in op['cells']]
+            return inverse
+        if kind == 'cells':
+            return self._apply_cells(op)
+        if kind == 'permute':
+            order = op['order']
+            inverse_order = [0] * len(order)
+            for new_row, old_row in enumerate(order):
+                inverse_order[old_row] = new_row
+            state['cells'] = [state['cells'][row] for row in order]
+            return {'op': 'permute', 'order': inverse_order}
+        if kind == 'cell':
+            row, col, cells = op['row'], op['col'], state['cells']
+            while len(cells) <= row:
+                cells.append([])
+            cells[row].extend([None] * (col + 1 - len(cells[row])))
+            inverse = {'op': 'cell', 'row': row, 'col': col, 'value': cells[row][col]}
+            cells[row][col] = op['value']
+            return inverse
+        if kind == 'header':
+            inverse = {'op': 'header', 'labels': state['labels'], 'original_labels': state['original_labels']}
+            state['labels'], state['original_labels'] = op['labels'], op['original_labels']
+            return inverse
+        if kind == 'hidden':
+            inverse = {'op': 'hidden', 'hidden': state['hidden']}
+            state['hidden'] = op['hidden']
+            return inverse
+        if kind == 'form':
+            inverse = {'op': 'form', 'field': op['field'], 'value': state['form'].get(op['field'])}
+            state['form'][op['field']] = op['value']
+            return inverse
+        raise ValueError(f"Unknown session operation: {kind}")
+
+    def _apply_cells(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        state, cells = self.state, self.state['cells']
+        n_rows, n_cols = op['rows'], len(op['labels'])
+        old_changes = [[row, col, value] for row, values in enumerate(cells) for col, value in enumerate(values)
+                       if value is not None and (row >= n_rows or col >= n_cols)]
+        old_changes += [[row, col, cells[row][col]] for row, col, _ in op['changes']
+                        if row < min(n_rows, len(cells)) and col < min(n_cols, len(cells[row]))]
+        inverse = {'op': 'cells', 'rows': len(cells), 'labels': state['labels'], 'changes': old_changes}
+
+        del cells[n_rows:]
+        cells.extend([] for _ in range(n_rows - len(cells)))
+        for values in cells:
+            del values[n_cols:]
+            values.extend([None] * (n_cols - len(values)))
+        for row, col, value in op['changes']:
+            cells[row][col] = value
+        state['labels'] = list(op['labels'])
+        return inverse
+
+    def apply(self, op: Dict[str, Any]) -> Dict[str, Any] | None:
+        kind = op['op']
+        if kind == 'undo':
+            return self._step(self.undo_stack, self.redo_stack)
+        if kind == 'redo':
+            return self._step(self.redo_stack, self.undo_stack)
+
+        inverse = self._apply(op)
+        top = self.undo_stack[-1] if self.undo_stack else None
+        if not (kind == 'form' and top and top['op'] == 'form' and top['field'] == op['field']
+                and not self.redo_stack):
+            self.undo_stack.append(inverse)
+            del self.undo_stack[:-UNDO_DEPTH]
+        self.redo_stack.clear()
+        return op
+
+    def _step(self, source: List[Dict[str, Any]], target: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+        if not source:
+            return None
+        op = source.pop()
+        target.append(self._apply(op))
+        return op
+
+
+class SessionJournal:
+    def __init__(self, session_dir: Path, compact_every: int = COMPACT_EVERY):
+        self.session_dir = Path(session_dir)
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.session_dir / 'snapshot.json'
+        self.journal_path = self.session_dir / 'journal.jsonl'
+        self.rotated_path = self.session_dir / 'journal.old.jsonl'
+        self.compact_every = compact_every
+        self.session = SessionState()
+        self.seq = 0
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._compaction: threading.Thread | None = None
+        self._file = None
+
+    @staticmethod
+    def _read_entries(path: Path) -> List[Dict[str, Any]]:
+        if not path.exists():
+            return []
+        entries = []
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return entries
+
+    def has_session(self) -> bool:
+        return any(path.exists() for path in [self.snapshot_path, self.journal_path, self.rotated_path])
+
+    def restore(self) -> SessionState:
+        snapshot_seq = 0
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot['seq']
+            self.session = SessionState(snapshot['state'], snapshot['undo'], snapshot['redo'])
+
+        self.seq = snapshot_seq
+        for entry in self._read_entries(self.rotated_path) + self._read_entries(self.journal_path):
+            if entry['seq'] > self.seq:
+                self.session.apply(entry['change'])
+                self.seq = entry['seq']
+        return self.session
+
+    def _journal_file(self):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a')
+        return self._file
+
+    def record_many(self, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        applied = []
+        with self._lock:
+            for op in ops:
+                if (change := self.session.apply(op)) is None:
+                    continue
+                applied.append(change)
+                self.seq += 1
+                self._journal_file().write(json.dumps({'seq': self.seq, 'change': op}, separators=(',', ':')) + '\n')
+            if applied:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._appended += len(applied)
+
+        if self._appended >= self.compact_every:
+            self.compact()
+        return applied
+
+    def record(self, op: Dict[str, Any]) -> Dict[str, Any] | None:
+        applied = self.record_many([op])
+        return applied[0] if applied else None
+
+    def record_table(self, file_path: Path | None, labels: List[str], original_labels: Dict[int, str],
+                     hidden: List[int], cells: List[List[str | None]]) -> Dict[str, Any] | None:
+        state = self.session.state
+        recorded_path = (state['file'] or {}).get('path')
+        if (file_path and str(file_path) != recorded_path) or not state['labels']:
+            file_info = None
+            if file_path and Path(file_path).is_file():
+                file_info = {'path': str(file_path), 'sha256': file_sha256(Path(file_path))}
+            return self.record({'op': 'table', 'file': file_info, 'labels': labels,
+                                'original_labels': {str(col): label for col, label in original_labels.items()},
+                                'hidden': hidden, 'cells': cells})
+        if labels == state['labels'] and (order := row_permutation(state['cells'], cells)) is not None:
+            return self.record({'op': 'permute', 'order': order})
+        return self.record(cell_changes(state['labels'], state['cells'], labels, cells))
+
+    def undo(self) -> Dict[str, Any] | None:
+        return self.record({'op': 'undo'})
+
+    def redo(self) -> Dict[str, Any] | None:
+        return self.record({'op': 'redo'})
+
+    def compact(self, wait: bool = False):
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.journal_path.exists() and not self.rotated_path.exists():
+                os.replace(self.journal_path, self.rotated_path)
+            snapshot = {'seq': self.seq, 'state': copy.deepcopy(self.session.state),
+                        'undo': list(self.session.undo_stack), 'redo': list(self.session.redo_stack)}
+            self._appended = 0
+            self._compaction = threading.Thread(target=self._write_snapshot, args=(snapshot,), daemon=True)
+            self._compaction.start()
+        if wait:
+            self._compaction.join()
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]):
+        tmp_path = self.snapshot_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self.rotated_path.unlink(missing_ok=True)
+
+    def clear(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            for path in [self.snapshot_path, self.journal_path, self.rotated_path]:
+                path.unlink(missing_ok=True)
+            self.session = SessionState()
+            self.seq = 0
+
+    def close(self):
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+        self.session = SessionState()
+        self.seq = 0
@@ -0,0 +1,315 @@
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from modules.fingerprint import FINGERPRINT_KEY, kit_fingerprint
+from modules.kit_type import KitTypeFields
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+ACCEPTABLE, INTERMEDIATE, INVALID = 'acceptable', 'intermediate', 'invalid'
+
+INDEX_SEQUENCE_PATTERN = r'^[ACGTacgt]+$'
+OVERRIDE_CYCLES_INDEX_PATTERN = r'^(?!.*x.*x)([IUN](?:\d+|x))+$'
+OVERRIDE_CYCLES_READ_PATTERN = r'^(?!.*x.*x)([YUN](?:\d+|x))+$'
+VERSION_PATTERN = r'^(\d{1,3}\.){0,2}\d{1,3}$'
+
+INDEX_SEQUENCE_REGEX = re.compile(INDEX_SEQUENCE_PATTERN)
+OVERRIDE_CYCLES_INDEX_REGEX = re.compile(OVERRIDE_CYCLES_INDEX_PATTERN)
+OVERRIDE_CYCLES_READ_REGEX = re.compile(OVERRIDE_CYCLES_READ_PATTERN)
+OVERRIDE_CYCLES_PARTIAL_REGEX = {
+    'index': re.compile(r'^(?!.*x.*x)([IUN](?:\d*|x))*$'),
+    'read': re.compile(r'^(?!.*x.*x)([YUN](?:\d*|x))*$'),
+}
+OVERRIDE_CYCLES_REGEX = {'index': OVERRIDE_CYCLES_INDEX_REGEX, 'read': OVERRIDE_CYCLES_READ_REGEX}
+OVERRIDE_CYCLES_SEGMENT_REGEX = re.compile(r'([YIUN])(\d+|x)')
+VERSION_REGEX = re.compile(VERSION_PATTERN)
+ADAPTER_CHARACTERS = frozenset('ACGT+')
+
+OVERRIDE_CYCLES_FIELDS = {
+    'override_cycles_pattern_r1': 'read',
+    'override_cycles_pattern_i1': 'index',
+    'override_cycles_pattern_i2': 'index',
+    'override_cycles_pattern_r2': 'read',
+}
+INDEX_LABELS = {'index_i7': 'override_cycles_pattern_i1', 'index_i5': 'override_cycles_pattern_i2'}
+REQUIRED_INDEX_KIT_FIELDS = ["name", "display_name", "version"]
+
+
+class OverrideCycleSegment(NamedTuple):
+    kind: str
+    length: int | None
+
+    def __str__(self) -> str:
+        return f"{self.kind}{'x' if self.length is None else self.length}"
+
+
+def override_cycles_state(text: str, read_type: str) -> str:
+    if not text or OVERRIDE_CYCLES_REGEX[read_type].match(text):
+        return ACCEPTABLE
+    if OVERRIDE_CYCLES_PARTIAL_REGEX[read_type].match(text):
+        return INTERMEDIATE
+    return INVALID
+
+
+@lru_cache(maxsize=1024)
+def parse_override_cycles(pattern: str, read_type: str) -> Tuple[OverrideCycleSegment, ...]:
+    if not OVERRIDE_CYCLES_REGEX[read_type].match(pattern or ''):
+        raise ValueError(f"Invalid {read_type} override cycles pattern: {pattern!r}")
+    return tuple(OverrideCycleSegment(kind, None if length == 'x' else int(length))
+                 for kind, length in OVERRIDE_CYCLES_SEGMENT_REGEX.findall(pattern))
+
+
+def compile_override_cycles(pattern: str, read_type: str, read_length: int) -> Tuple[OverrideCycleSegment, ...]:
+    segments = parse_override_cycles(pattern, read_type)
+    fixed_cycles = sum(segment.length for segment in segments if segment.length is not None)
+    if fixed_cycles > read_length:
+        raise ValueError(f"{pattern} needs {fixed_cycles} cycles but the read has {read_length}")
+    if all(segment.length is not None for segment in segments) and fixed_cycles != read_length:
+        raise ValueError(f"{pattern} covers {fixed_cycles} cycles but the read has {read_length}")
+    return tuple(OverrideCycleSegment(segment.kind, read_length - fixed_cycles if segment.length is None
+                                      else segment.length) for segment in segments)
+
+
+def format_override_cycles(segments: Iterable[OverrideCycleSegment]) -> str:
+    return ''.join(str(segment) for segment in segments if segment.length != 0)
+
+
+def version_state(text: str) -> str:
+    if not text or VERSION_REGEX.match(text):
+        return ACCEPTABLE
+    if VERSION_REGEX.match(text + '0'):
+        return INTERMEDIATE
+    return INVALID
+
+
+def name_state(text: str) -> str:
+    return ACCEPTABLE if not text or text.isalnum() or '_' in text else INVALID
+
+
+def adapter_state(text: str) -> str:
+    return ACCEPTABLE if set(text.upper()) <= ADAPTER_CHARACTERS else INVALID
+
+
+def override_cycles_errors(resource_data: Dict[str, str], required: bool = True) -> List[str]:
+    errors = []
+    for k, read_type in OVERRIDE_CYCLES_FIELDS.items():
+        if not required and k not in resource_data:
+            continue
+        if not OVERRIDE_CYCLES_REGEX[read_type].match(resource_data.get(k) or ''):
+            errors.append(f"Incomplete override cycle pattern field: {k}")
+
+    return errors
+
+
+def index_kit_errors(index_kit_data: Dict[str, str]) -> List[str]:
+    errors = []
+    if missing_required_fields := [item for item in REQUIRED_INDEX_KIT_FIELDS if not index_kit_data.get(item)]:
+        errors.append(f"Missing required index kit fields: {', '.join(missing_required_fields)}")
+    return errors
+
+
+def resource_errors(resource_data: Dict[str, str]) -> List[str]:
+    errors = [f"Invalid adapter sequence in {k}" for k in ['adapter_read1', 'adapter_read2']
+              if adapter_state(resource_data.get(k) or '') != ACCEPTABLE]
+    return errors + override_cycles_errors(resource_data)
+
+
+def index_values(label: str, df: 'pd.DataFrame') -> 'pd.Series':
+    return df[label].where(df[label] != 'nan').dropna()
+
+
+def invalid_index_rows(label: str, df: 'pd.DataFrame') -> List[int]:
+    _df_tmp = index_values(label, df)
+    invalid_mask = ~_df_tmp.astype(str).str.match(INDEX_SEQUENCE_PATTERN)
+    return [v + 1 for v in df.index.get_indexer(_df_tmp.index[invalid_mask]).tolist()]
+
+
+def row_summary(rows: Sequence[Any], limit: int = 10) -> str:
+    shown = ', '.join(str(row) for row in rows[:limit])
+    return f"{shown} and {len(rows) - limit} more" if len(rows) > limit else shown
+
+
+def invalid_rows_message(label: str, invalid_rows: Sequence[int]) -> str:
+    return (f"{label} data contains {len(invalid_rows)} invalid non-empty sequences. "
+            f"Invalid rows: {row_summary(invalid_rows)}")
+
+
+def index_lengths(label: str, df: 'pd.DataFrame') -> 'np.ndarray':
+    return index_values(label, df).str.len().unique()
+
+
+def index_column_errors(df: 'pd.DataFrame', labels: Iterable[str] = ('index_i7', 'index_i5'),
+                        mixed_lengths: bool = False) -> List[str]:
+    errors = []
+    for label in labels:
+        if label not in df.columns:
+            continue
+        if invalid_rows := invalid_index_rows(label, df):
+            errors.append(invalid_rows_message(label, invalid_rows))
+        elif not mixed_lengths and len(index_lengths(label, df)) != 1:
+            errors.append(f"{label} column contains indexes of different lengths")
+    return errors
+
+
+def index_length_groups(label: str, df: 'pd.DataFrame') -> Dict[int, int]:
+    return {int(length): int(count) for length, count in
+            index_values(label, df).str.len().value_counts().sort_index().items()}
+
+
+def length_override_cycles(length: int, index_cycles: int) -> str:
+    return f"I{length}N{index_cycles - length}" if length < index_cycles else f"I{length}"
+
+
+def length_group_override_cycles(label: str, df: 'pd.DataFrame', index_cycles: int | None = None) -> Dict[str, str]:
+    lengths = index_length_groups(label, df)
+    index_cycles = index_cycles or max(lengths, default=0)
+    return {str(length): length_override_cycles(length, index_cycles) for length in lengths}
+
+
+def padded_collisions(rows: Sequence[Tuple[str, ...] | None]) -> List[Tuple[int, int]]:
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for row, sequences in enumerate(rows):
+        if sequences:
+            groups.setdefault(tuple(len(seq) for seq in sequences), []).append(row)
+
+    collisions = set()
+    group_items = list(groups.items())
+    for i, (lengths_a, rows_a) in enumerate(group_items):
+        for lengths_b, rows_b in group_items[i:]:
+            shared = [min(a, b) for a, b in zip(lengths_a, lengths_b)]
+            seen: Dict[Tuple[str, ...], List[int]] = {}
+            for row in rows_a:
+                seen.setdefault(tuple(seq[:n] for seq, n in zip(rows[row], shared)), []).append(row)
+            for row in rows_b:
+                for other in seen.get(tuple(seq[:n] for seq, n in zip(rows[row], shared)), ()):
+                    if other != row:
+                        collisions.add((min(row, other) + 1, max(row, other) + 1))
+
+    return sorted(collisions)
+
+
+def padded_index_collisions(df: 'pd.DataFrame', labels: Iterable[str]) -> List[Tuple[int, int]]:
+    labels = [label for label in labels if label in df.columns]
+    if not labels:
+        return []
+    columns = [df[label].where(df[label] != 'nan').str.upper().tolist() for label in labels]
+    rows = [None if any(not isinstance(seq, str) or not seq for seq in row) else row for row in zip(*columns)]
+    return padded_collisions(rows)
+
+
+def pool_collision_errors(tables: Dict[Any, 'pd.DataFrame'], names: Dict[Any, str] | None = None) -> List[str]:
+    labels = [label for label in INDEX_LABELS if all(label in df.columns for df in tables.values())]
+    if not labels or len(tables) < 2:
+        return []
+
+    owners, rows = [], []
+    for key, df in tables.items():
+        kit_name = (names or {}).get(key, key)
+        columns = [df[label].where(df[label] != 'nan').str.upper().tolist() for label in labels]
+        for row, sequences in enumerate(zip(*columns), start=1):
+            owners.append(f"{kit_name} row {row}")
+            rows.append(None if any(not isinstance(seq, str) or not seq for seq in sequences) else sequences)
+
+    collisions = [(owners[a - 1], owners[b - 1]) for a, b in padded_collisions(rows)]
+    if not collisions:
+        return []
+    return [f"Combined pool of {len(tables)} kits: {' + '.join(labels)} collide in {len(collisions)} row pairs: "
+            f"{row_summary([f'{a} / {b}' for a, b in collisions])}"]
+
+
+def index_label_sets(kit_type_obj: KitTypeFields) -> List[List[str]]:
+    label_sets = [[field for field in kit_type_obj.index_set_fields(set_name) if field in INDEX_LABELS]
+                  for set_name in kit_type_obj.index_set_names]
+    return [labels for labels in label_sets if labels]
+
+
+def collision_message(labels: Iterable[str], collisions: List[Tuple[int, int]]) -> str:
+    return f"{' + '.join(labels)} collide in {len(collisions)} row pairs: " \
+           f"{row_summary([f'{a}/{b}' for a, b in collisions])}"
+
+
+def index_collision_errors(df: 'pd.DataFrame', kit_type_obj: KitTypeFields) -> List[str]:
+    return [collision_message(labels, collisions) for labels in index_label_sets(kit_type_obj)
+            if (collisions := padded_index_collisions(df, labels))]
+
+
+def is_record_list(records: Any) -> bool:
+    return isinstance(records, list) and all(isinstance(record, dict) for record in records)
+
+
+def field_type_errors(section: str, data: Dict[str, Any], nested: Iterable[str] = ()) -> List[str]:
+    if fields := sorted(key for key, value in data.items() if key not in nested and not isinstance(value, str)):
+        return [f"{section} fields must be strings: {', '.join(fields)}"]
+    return []
+
+
+def index_set_errors(set_name: str, fields: List[str], records: List[Dict[str, Any]],
+                     mixed_lengths: bool) -> List[str]:
+    errors = []
+    if not is_record_list(records):
+        return [f"Index set {set_name} must be a list of objects"]
+    if not records:
+        return [f"Index set {set_name} is empty"]
+
+    for row, record in enumerate(records, start=1):
+        if not_strings := [field for field in fields if not isinstance(record.get(field, ''), (str, type(None)))]:
+            errors.append(f"Index set {set_name} row {row} has non-string values: {', '.join(not_strings)}")
+    if errors:
+        return errors
+
+    for row, record in enumerate(records, start=1):
+        if missing := [field for field in fields if record.get(field) in (None, '')]:
+            errors.append(f"Index set {set_name} row {row} is missing: {', '.join(missing)}")
+
+    index_fields = [field for field in fields if field in INDEX_LABELS]
+    for field in index_fields:
+        sequences = [str(record.get(field) or '') for record in records]
+        if invalid_rows := [row for row, seq in enumerate(sequences, start=1)
+                            if seq and not INDEX_SEQUENCE_REGEX.match(seq)]:
+            errors.append(invalid_rows_message(field, invalid_rows))
+        elif not mixed_lengths and len({len(seq) for seq in sequences if seq}) > 1:
+            errors.append(f"{field} column contains indexes of different lengths")
+
+    if index_fields and not errors:
+        rows = [tuple(str(record[field]).upper() for field in index_fields) for record in records]
+        if collisions := padded_collisions(rows):
+            errors.append(f"Index set {set_name}: {collision_message(index_fields, collisions)}")
+    return errors
+
+
+def validate_kit_document(document: Dict[str, Any], kit_type_fields: Dict[str, KitTypeFields]) -> List[str]:
+    if missing_sections := [section for section in ['resource', 'index_kit', 'indexes']
+                            if not isinstance(document.get(section), dict)]:
+        return [f"Missing document sections: {', '.join(missing_sections)}"]
+
+    resource, index_kit, indexes = document['resource'], document['index_kit'], document['indexes']
+    if errors := (field_type_errors('resource', resource, ['override_cycles_length_groups'])
+                  + field_type_errors('index_kit', index_kit, ['kit_type'])):
+        return errors
+
+    errors = resource_errors(resource) + index_kit_errors(index_kit)
+    well_formed = all(is_record_list(records) for records in indexes.values())
+    if well_formed and FINGERPRINT_KEY in document and document[FINGERPRINT_KEY] != kit_fingerprint(document):
+        errors.append("Stored fingerprint does not match the resource, index_kit and indexes content")
+
+    kit_type = resource.get('kit_type')
+    if kit_type not in kit_type_fields:
+        return errors + [f"Unsupported kit type: {kit_type}"]
+    kit_type_obj = kit_type_fields[kit_type]
+    if index_kit.get('kit_type') != kit_type_obj.data:
+        errors.append(f"index_kit.kit_type does not match the {kit_type} definition")
+
+    mixed_lengths = bool(resource.get('override_cycles_length_groups'))
+    for set_name in kit_type_obj.index_set_names:
+        if set_name not in indexes:
+            errors.append(f"Missing index set: {set_name}")
+            continue
+        errors += index_set_errors(set_name, kit_type_obj.index_set_fields(set_name), indexes[set_name],
+                                   mixed_lengths)
+    if unexpected_sets := set(indexes) - set(kit_type_obj.index_set_names):
+        errors.append(f"Unexpected index sets for {kit_type}: {', '.join(sorted(unexpected_sets))}")
+
+    return errors
@@ -0,0 +1,155 @@
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from threading import Event
+from typing import Any, Dict, Tuple
+
+from modules.export import TIMESTAMP_FORMAT, convert_illumina_kit
+from modules.file_hash import file_sha256
+from modules.kit_type import load_kit_type_fields
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _convert_job(file_path: Path, output_path: Path, kit_type_fields_path: Path) -> Dict[str, Any]:
+    start = time.perf_counter()
+    data = convert_illumina_kit(file_path, output_path, load_kit_type_fields(kit_type_fields_path))
+    return {'kit_type': data['resource']['kit_type'], 'fingerprint': data['fingerprint'],
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+class WatchFolderConverter:
+    def __init__(self, watch_dir: Path, output_dir: Path, kit_type_fields_path: Path,
+                 pattern: str = '*.tsv', settle_seconds: float = 2.0, poll_interval: float = 1.0,
+                 max_workers: int = 2):
+        self.watch_dir = Path(watch_dir)
+        self.output_dir = Path(output_dir)
+        self.kit_type_fields_path = Path(kit_type_fields_path)
+        self.pattern = pattern
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+
+        self.manifest_path = self.output_dir / MANIFEST_NAME
+        self.manifest = self._load_manifest()
+        self._converted_hashes = {entry['sha256']: entry['output'] for entry in self.manifest['files'].values()
+                                  if entry.get('status') == 'converted'}
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+        self._running: Dict[Future, Tuple[Path, str, Tuple[int, int]]] = {}
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r') as manifest_file:
+                return json.load(manifest_file)
+        return {'watch_dir': str(self.watch_dir), 'files': {}}
+
+    def _write_manifest(self):
+        self.manifest['updated'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=4)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _record(self, file_path: Path, signature: Tuple[int, int], **entry: Any):
+        self.manifest['files'][str(file_path)] = {
+            'size': signature[0],
+            'mtime_ns': signature[1],
+            'checked': datetime.now().strftime(TIMESTAMP_FORMAT),
+            **entry,
+        }
+
+    def _is_processed(self, file_path: Path, signature: Tuple[int, int]) -> bool:
+        entry = self.manifest['files'].get(str(file_path))
+        return entry is not None and (entry['size'], entry['mtime_ns']) == signature
+
+    def scan(self) -> int:
+        now = time.monotonic()
+        in_flight = {path for path, _, _ in self._running.values()}
+        submitted = 0
+
+        for file_path in sorted(self.watch_dir.glob(self.pattern)):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+
+            if file_path in in_flight or self._is_processed(file_path, signature):
+                self._pending.pop(file_path, None)
+                continue
+
+            previous = self._pending.get(file_path)
+            if previous is None or previous[0] != signature:
+                self._pending[file_path] = (signature, now)
+                continue
+            if now - previous[1] < self.settle_seconds or len(self._running) >= 2 * self.max_workers:
+                continue
+
+            try:
+                dispatched = self._dispatch(file_path, signature)
+            except FileNotFoundError:
+                del self._pending[file_path]
+                continue
+            if dispatched:
+                del self._pending[file_path]
+                submitted += 1
+
+        return submitted
+
+    def _dispatch(self, file_path: Path, signature: Tuple[int, int]) -> bool:
+        sha256 = file_sha256(file_path)
+        if sha256 in self._converted_hashes:
+            self._record(file_path, signature, sha256=sha256, status='duplicate',
+                         output=self._converted_hashes[sha256])
+            self._write_manifest()
+            return True
+        if any(sha256 == running_sha256 for _, running_sha256, _ in self._running.values()):
+            return False
+
+        output_path = self.output_dir / file_path.with_suffix('.json').name
+        self._forget_output(output_path)
+        future = self._executor.submit(_convert_job, file_path, output_path, self.kit_type_fields_path)
+        self._running[future] = (file_path, sha256, signature)
+        return True
+
+    def _forget_output(self, output_path: Path):
+        self._converted_hashes = {sha256: output for sha256, output in self._converted_hashes.items()
+                                  if output != str(output_path)}
+
+    def collect(self, wait: bool = False) -> int:
+        finished = [future for future in self._running if wait or future.done()]
+        for future in finished:
+            file_path, sha256, signature = self._running.pop(future)
+            output_path = self.output_dir / file_path.with_suffix('.json').name
+            try:
+                result = future.result()
+                self._converted_hashes[sha256] = str(output_path)
+                self._record(file_path, signature, sha256=sha256, status='converted', output=str(output_path),
+                             **result)
+            except Exception as e:
+                self._record(file_path, signature, sha256=sha256, status='error', output=None, error=str(e))
+
+        if finished:
+            self._write_manifest()
+        return len(finished)
+
+    def run(self, stop_event: Event | None = None, once: bool = False):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stop_event = stop_event or Event()
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            self._executor = executor
+            try:
+                while not stop_event.is_set():
+                    self.scan()
+                    self.collect()
+                    if once and not self._pending and not self._running:
+                        break
+                    stop_event.wait(self.poll_interval)
+            finally:
+                self.collect(wait=True)
+                self._executor = None
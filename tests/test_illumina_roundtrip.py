@@ -0,0 +1,96 @@
+import random
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from modules.export import table_kit_data
+from modules.illumina_indexes import IlluminaFormatIndexKitDefinition
+from modules.illumina_writer import iter_illumina_kit_lines
+from modules.kit_type import load_kit_type_fields
+
+KIT_TYPE_FIELDS = load_kit_type_fields(Path(__file__).parents[1] / 'config' / 'kit_type_fields.yaml')
+STRATEGIES = {'fixed_dual_index': 'DualOnly', 'fixed_single_index': 'SingleOnly', 'standard_dual_index': 'All',
+              'standard_single_index': 'SingleOnly'}
+WELLS = [f"{row}{col:02d}" for row in 'ABCDEFGH' for col in range(1, 13)]
+INDEX_KIT = {'name': 'RoundTripKit', 'display_name': 'RoundTripKit', 'version': '1.0.0',
+             'description': 'Roundtripkit'}
+
+
+def _sequences(rng: random.Random, n: int, length: int) -> list:
+    sequences = set()
+    while len(sequences) < n:
+        sequences.add(''.join(rng.choice('ACGT') for _ in range(length)))
+    return sorted(sequences, key=lambda _: rng.random())
+
+
+def _indices(rng: random.Random, prefix: str, read_number: int, n: int, length: int) -> list:
+    return [f"{prefix}{k + 1:03d}\t{seq}\t{read_number}" for k, seq in enumerate(_sequences(rng, n, length))]
+
+
+def illumina_kit_text(kit_type: str, seed: int) -> str:
+    rng = random.Random(seed)
+    n_i7, n_i5 = rng.randint(2, 24), rng.randint(2, 16)
+    length = rng.choice([6, 8, 10])
+    resources, indices = [], _indices(rng, 'D7', 1, n_i7, length)
+    if kit_type.endswith('dual_index'):
+        indices += _indices(rng, 'D5', 2, n_i5, length)
+    if kit_type == 'fixed_dual_index':
+        pairs = rng.sample([(i7, i5) for i7 in range(1, n_i7 + 1) for i5 in range(1, n_i5 + 1)], min(n_i7, n_i5))
+        pairs += [(i7, rng.randint(1, n_i5)) for i7 in range(1, n_i7 + 1) if i7 not in {p[0] for p in pairs}]
+        pairs += [(rng.randint(1, n_i7), i5) for i5 in range(1, n_i5 + 1) if i5 not in {p[1] for p in pairs}]
+        pairs = list(dict.fromkeys(pairs))
+        resources = [f"{well}\tFixedIndexPosition\tstring\tD7{i7:03d}-D5{i5:03d}"
+                     for well, (i7, i5) in zip(WELLS, pairs)]
+    elif kit_type == 'fixed_single_index':
+        resources = [f"{well}\tFixedIndexPosition\tstring\tD7{i7:03d}" for well, i7 in zip(WELLS, range(1, n_i7 + 1))]
+
+    return '\n'.join(['[IndexKit]', 'Name\tRoundTripKit', 'DisplayName\tRoundTripKit', 'Version\t1.0.0',
+                      'Description\tRoundtripkit', f"IndexStrategy\t{STRATEGIES[kit_type]}", '', '[Resources]',
+                      'Name\tType\tFormat\tValue', f"Adapter\tstring\tstring\t{''.join(_sequences(rng, 1, 20))}",
+                      *resources, '', '[Indices]', 'Name\tSequence\tIndexReadNumber', *indices, ''])
+
+
+def export_document(ikd: IlluminaFormatIndexKitDefinition) -> dict:
+    resource = {'adapter_read1': ikd.resources.get('adapter', ''),
+                'adapter_read2': ikd.resources.get('adapter_read2', '')}
+    if ikd.indices_i5.empty:
+        resource['override_cycles_pattern_i2'] = 'N10'
+    return table_kit_data(ikd.indices_df, KIT_TYPE_FIELDS, ikd.kit_type, INDEX_KIT, resource, {})
+
+
+def round_trip(ikd: IlluminaFormatIndexKitDefinition) -> IlluminaFormatIndexKitDefinition:
+    return IlluminaFormatIndexKitDefinition.from_text('\n'.join(iter_illumina_kit_lines(export_document(ikd))))
+
+
+@pytest.mark.parametrize('seed', range(25))
+@pytest.mark.parametrize('kit_type', list(STRATEGIES))
+def test_parse_export_parse_gives_identical_kits(kit_type, seed):
+    ikd = IlluminaFormatIndexKitDefinition.from_text(illumina_kit_text(kit_type, seed))
+    assert ikd.kit_type == kit_type
+    assert not ikd.fixed_position_issues
+
+    parsed = round_trip(ikd)
+    assert parsed.kit_type == ikd.kit_type
+    assert parsed.is_combinatorial == ikd.is_combinatorial
+    assert parsed.index_kit == ikd.index_kit
+    assert parsed.resources == ikd.resources
+    assert not parsed.fixed_position_issues
+    pd.testing.assert_frame_equal(parsed.indices_df, ikd.indices_df)
+    assert export_document(parsed)['fingerprint'] == export_document(ikd)['fingerprint']
+
+
+def test_conflicting_index_names_are_rejected():
+    document = export_document(IlluminaFormatIndexKitDefinition.from_text(illumina_kit_text('fixed_dual_index', 0)))
+    records = document['indexes']['dual_fixed']
+    records.append({**records[0], 'fixed_pos': 'H12', 'index_i7': records[1]['index_i7']})
+    with pytest.raises(ValueError, match='used for two sequences'):
+        list(iter_illumina_kit_lines(document))
+
+
+def test_position_kits_are_rejected():
+    df = pd.DataFrame({'pos_i7': ['A', 'B'], 'index_i7_name': ['D701', 'D702'], 'index_i7': ['ACGTACGT', 'TGCATGCA']})
+    document = table_kit_data(df, KIT_TYPE_FIELDS, 'standard_pos_single_index', INDEX_KIT,
+                              {'override_cycles_pattern_i2': 'N10'}, {})
+    with pytest.raises(ValueError, match='pos_i7'):
+        list(iter_illumina_kit_lines(document))